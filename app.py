@@ -1,24 +1,172 @@
-from flask import Flask, render_template, jsonify, session, redirect, url_for, request
-from intelligence_engine import generate_insights
-import pandas as pd
+from flask import Flask, Response, render_template, jsonify, session, redirect, url_for, request, g, abort, send_from_directory
+from instrumentation import STAGE_LOG, instrument_flask, render_stage_metrics
+from http_cache import (HEATMAP_FILE, enable_http_caching, cache_heatmap, data_version, heatmap_version,
+                        not_modified, set_validators, versioned_max_age)
+from stores import list_stores, store_dir, store_path
 import json
 import os
+import threading
+import urllib.request
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
 app = Flask(__name__)
+request_metrics = instrument_flask(app)
+enable_http_caching(app)
 
 # --- CONFIGURATION ---
 ANALYTICS_FILE = 'zone_analytics.csv'
 HISTORICAL_FILE = 'historical_analytics.csv' # Added the new Data Warehouse
+DELTAS_FILE = 'kpi_deltas.csv'     # Precomputed dod/wow comparisons (kpi_engine.py)
+PREFIX_FILE = 'kpi_prefix.csv'     # Running sums per zone, for arbitrary ranges
 STRATEGY_FILE = 'strategy_log.json'
+STATIC_FOLDER = 'static'   # Heatmaps, inside each store's directory
+CACHE_BUDGET_BYTES = int(os.getenv('MOSAIC_CACHE_MB', '256')) * 1024 * 1024   # Parsed KPI tables, all stores together
+LIVE_STATE_URL = os.getenv('MOSAIC_LIVE_STATE_URL', 'http://127.0.0.1:9751/state') # live_ingestion.py
+
+# Heavy dependencies (pandas via schemas, groq via intelligence_engine) are imported inside
+# the functions that use them, so a worker can bind and answer before they are needed.
+
+# --- SHARED DATA CACHE ---
+class KpiCache:
+    """
+    Parsed KPI tables (or indexes built from them) keyed by path and invalidated by
+    (mtime, size). The total size across every store is capped; the least recently used
+    entries are dropped first.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.tables = OrderedDict()   # path -> (version, DataFrame, nbytes); treat the frames as read-only
+        self.nbytes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, load=None):
+        """load(path) builds the cached object; the default is the parsed KPI table."""
+        if load is None:
+            from schemas import read_kpi
+            load = read_kpi
+        st = os.stat(path)
+        version = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            cached = self.tables.get(path)
+            if cached is not None and cached[0] == version:
+                self.tables.move_to_end(path)
+                return cached[1]
+
+        df = load(path)   # Parsed outside the lock so other stores keep being served
+        nbytes = int(df.memory_usage(deep=True).sum()) if hasattr(df, 'memory_usage') else df.nbytes
+        with self.lock:
+            self._drop(path)
+            if nbytes <= self.max_bytes:
+                self.tables[path] = (version, df, nbytes)
+                self.nbytes += nbytes
+                while self.nbytes > self.max_bytes:
+                    self._drop(next(iter(self.tables)))
+                    self.evictions += 1
+        return df
+
+    def _drop(self, path):
+        entry = self.tables.pop(path, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
+    def render(self):
+        with self.lock:
+            return [
+                "# HELP mosaic_kpi_cache_bytes Memory held by parsed KPI tables in this worker.",
+                "# TYPE mosaic_kpi_cache_bytes gauge",
+                f"mosaic_kpi_cache_bytes {self.nbytes}",
+                "# HELP mosaic_kpi_cache_limit_bytes Budget for parsed KPI tables across all stores.",
+                "# TYPE mosaic_kpi_cache_limit_bytes gauge",
+                f"mosaic_kpi_cache_limit_bytes {self.max_bytes}",
+                "# HELP mosaic_kpi_cache_tables Parsed KPI tables currently cached.",
+                "# TYPE mosaic_kpi_cache_tables gauge",
+                f"mosaic_kpi_cache_tables {len(self.tables)}",
+                "# HELP mosaic_kpi_cache_evictions_total Tables dropped to stay within the budget.",
+                "# TYPE mosaic_kpi_cache_evictions_total counter",
+                f"mosaic_kpi_cache_evictions_total {self.evictions}",
+            ]
+
+kpi_cache = KpiCache(CACHE_BUDGET_BYTES)
+
+def read_kpi_cached(path):
+    """Parses a KPI CSV once per file version instead of on every request."""
+    return kpi_cache.get(path)
+
+def load_delta_index(path):
+    from schemas import read_kpi_deltas
+    from comparisons import DeltaIndex
+    return DeltaIndex(read_kpi_deltas(path))
+
+def load_prefix_index(path):
+    from schemas import read_kpi_prefix
+    from comparisons import PrefixIndex
+    return PrefixIndex(read_kpi_prefix(path))
+
+COMPARISON_LOADERS = {DELTAS_FILE: load_delta_index, PREFIX_FILE: load_prefix_index}
+
+def preload_shared_data():
+    """
+    Run once in the gunicorn master (see gunicorn.conf.py) before workers fork: imports the
+    heavy modules and fills the KPI cache so every worker starts warm and shares those pages
+    copy-on-write. DataFrame columns live in a few large numpy buffers, which refcounting
+    in the workers never writes to.
+    """
+    import schemas, comparisons, intelligence_engine
+    for store_id in [None] + list_stores():
+        for name in (ANALYTICS_FILE, HISTORICAL_FILE, DELTAS_FILE, PREFIX_FILE):
+            path = store_path(store_id, name)
+            if os.path.exists(path):
+                kpi_cache.get(path, COMPARISON_LOADERS.get(name))
+
+# --- STORE ROUTING ---
+# Every page and API route exists twice: /dashboard serves the store in the working directory,
+# /stores/<store_id>/dashboard a store under stores/. url_for() stays within the current store.
+def store_route(rule, **options):
+    def decorator(view):
+        app.add_url_rule(rule, view_func=view, defaults={'store_id': None}, **options)
+        app.add_url_rule(f'/stores/<store_id>{rule}', view_func=view, **options)
+        return view
+    return decorator
+
+@app.url_value_preprocessor
+def pull_store_id(endpoint, values):
+    g.store_id = values.pop('store_id', None) if values else None
+    try:
+        store_dir(g.store_id)
+    except KeyError:
+        abort(404)
+
+@app.url_defaults
+def keep_store_id(endpoint, values):
+    if 'store_id' not in values and g.get('store_id') and app.url_map.is_endpoint_expecting(endpoint, 'store_id'):
+        values['store_id'] = g.store_id
+
+@app.context_processor
+def inject_store():
+    return {'store_id': g.get('store_id'), 'stores': list_stores()}
+
+def data_file(name):
+    """Path of a data file in the store this request is for."""
+    return store_path(g.get('store_id'), name)
+
+def heatmap_dates():
+    """Days with a compiled heatmap in the current store, newest first."""
+    folder = data_file(STATIC_FOLDER)
+    if not os.path.isdir(folder):
+        return []
+    return sorted((m.group(1) for m in map(HEATMAP_FILE.match, os.listdir(folder)) if m), reverse=True)
 
 # --- DATA LOADERS ---
 def load_analytics():
     """Reads the Live Cache (Latest Day) KPI CSV."""
-    if not os.path.exists(ANALYTICS_FILE):
+    path = data_file(ANALYTICS_FILE)
+    if not os.path.exists(path):
         return []
     try:
-        df = pd.read_csv(ANALYTICS_FILE)
+        df = read_kpi_cached(path)
         return df.to_dict(orient='records')
     except Exception as e:
         print(f"Error loading analytics: {e}")
@@ -26,10 +174,11 @@ def load_analytics():
 
 def load_strategies():
     """Reads the AI Strategy JSON."""
-    if not os.path.exists(STRATEGY_FILE):
+    path = data_file(STRATEGY_FILE)
+    if not os.path.exists(path):
         return []
     try:
-        with open(STRATEGY_FILE, 'r') as f:
+        with open(path, 'r') as f:
             return json.load(f)
     except Exception as e:
         print(f"Error loading strategies: {e}")
@@ -38,12 +187,13 @@ def load_strategies():
 
 def get_latest_zone_data():
     """Reads the live zone_analytics.csv cache and returns it as a dictionary for the dashboard."""
-    if not os.path.exists('zone_analytics.csv'):
-        print("⚠️ Warning: zone_analytics.csv not found.")
+    path = data_file(ANALYTICS_FILE)
+    if not os.path.exists(path):
+        print(f"⚠️ Warning: {path} not found.")
         return []
     
     try:
-        df = pd.read_csv('zone_analytics.csv')
+        df = read_kpi_cached(path)
         # Converts the dataframe into a list of dictionaries that HTML can read
         return df.to_dict('records') 
     except Exception as e:
@@ -54,11 +204,11 @@ def get_latest_zone_data():
 
 # --- ROUTES ---
 
-@app.route('/')
+@store_route('/')
 def index():
     return redirect(url_for('dashboard'))
 
-@app.route('/dashboard')
+@store_route('/dashboard')
 def dashboard():
     # 1. Load the latest zone data
     zones = get_latest_zone_data()
@@ -147,8 +297,17 @@ def dashboard():
             "peak_time_window": peak_time_window
         }
 
+    dates = heatmap_dates()
+    heatmap_options = [(d, datetime.strptime(d, '%Y-%m-%d').strftime('%b %d, %Y')) for d in dates]
+    # The page itself always revalidates; the URLs it builds pin the data they were rendered
+    # from, so past days can be cached for long without outliving a pipeline re-run
+    data_versions = {'heatmaps': heatmap_version(data_file(STATIC_FOLDER)),
+                     'api': data_version(data_file(HISTORICAL_FILE), data_file(ANALYTICS_FILE))[0]}
+
     return render_template('dashboard.html', 
                            page='dashboard',
+                           heatmap_options=heatmap_options,
+                           data_versions=data_versions,
                            zones=zones,
                            total_visitors=total_visitors,
                            total_revenue=total_revenue,
@@ -158,26 +317,27 @@ def dashboard():
 
     
 
-@app.route('/analytics')
+@store_route('/analytics')
 def analytics():
     # --- AGGREGATE REAL HISTORICAL DATA FOR ALL 6 DAYS ---
     history_dates = []
     history_revenue = []
     all_data = []
     
-    if os.path.exists(HISTORICAL_FILE):
+    history_file = data_file(HISTORICAL_FILE)
+    if os.path.exists(history_file):
         try:
-            df_hist = pd.read_csv(HISTORICAL_FILE)
+            df_hist = read_kpi_cached(history_file)
             
             # 1. Line Chart Data (Group by Date)
-            daily_revenue = df_hist.groupby('Date')['Revenue'].sum().reset_index()
+            daily_revenue = df_hist.groupby('Date', observed=True)['Revenue'].sum().reset_index()
             history_dates = daily_revenue['Date'].tolist()
             history_revenue = daily_revenue['Revenue'].tolist()
             
             # 2. THE UPGRADE: 6-Day Data for Bar Chart & Table (Group by Zone)
             # We SUM the volume (Visitors/Revenue) and AVERAGE the performance (Conversion/Dwell)
             if 'Zone_Name' in df_hist.columns:
-                agg_df = df_hist.groupby('Zone_Name').agg({
+                agg_df = df_hist.groupby('Zone_Name', observed=True).agg({
                     'Visitors': 'sum',
                     'Revenue': 'sum',
                     'Conversion_Rate': 'mean',
@@ -209,54 +369,154 @@ def analytics():
 
 
 # --- NEW ROUTE: SILENT API FOR DASHBOARD HEATMAP ---
-@app.route('/api/dashboard/<date>')
+@store_route('/api/dashboard/<date>')
 def api_dashboard_data(date):
     """Fetches exact metrics for the day selected in the Dashboard dropdown."""
     try:
-        if os.path.exists(HISTORICAL_FILE):
-            df = pd.read_csv(HISTORICAL_FILE)
-            if 'Date' in df.columns:
-                day_data = df[df['Date'] == date]
-                if not day_data.empty:
-                    zones = day_data.to_dict('records')
-                    return jsonify({
-                        'total_visitors': int(sum(z['Visitors'] for z in zones)),
-                        'total_revenue': int(sum(z['Revenue'] for z in zones)),
-                        'avg_conversion': round(sum(z['Conversion_Rate'] for z in zones) / len(zones), 1)
-                    })
-        
+        # The answer only changes when one of the KPI files is rewritten by the pipeline
+        history_file = data_file(HISTORICAL_FILE)
+        etag, last_modified = data_version(history_file, data_file(ANALYTICS_FILE))
+        df = read_kpi_cached(history_file) if os.path.exists(history_file) else None
+
+        # Days before the newest compiled one can be kept, as long as the URL pins this version
+        historical = False
+        if df is not None and 'Date' in df.columns and len(df):
+            dates = df['Date'].cat.categories   # KPI schema: Date is categorical, ISO strings
+            historical = date in dates and date < dates.max()
+        max_age = versioned_max_age(etag, final=historical)
+
+        if not_modified(etag, last_modified):
+            return set_validators(Response(status=304), etag, last_modified, max_age)
+
+        if df is not None and 'Date' in df.columns:
+            day_data = df[df['Date'] == date]
+            if not day_data.empty:
+                zones = day_data.to_dict('records')
+                return set_validators(jsonify({
+                    'total_visitors': int(sum(z['Visitors'] for z in zones)),
+                    'total_revenue': int(sum(z['Revenue'] for z in zones)),
+                    'avg_conversion': round(sum(z['Conversion_Rate'] for z in zones) / len(zones), 1)
+                }), etag, last_modified, max_age)
+
         # Fallback to today's live data if the exact date isn't found
         zones = get_latest_zone_data()
-        return jsonify({
+        return set_validators(jsonify({
             'total_visitors': int(sum(z['Visitors'] for z in zones)),
             'total_revenue': int(sum(z['Revenue'] for z in zones)),
             'avg_conversion': round(sum(z['Conversion_Rate'] for z in zones) / len(zones), 1) if zones else 0
-        })
+        }), etag, last_modified)
     except Exception as e:
         print(f"API Error: {e}")
         return jsonify({'total_visitors': 0, 'total_revenue': 0, 'avg_conversion': 0})
 
 
+# --- NEW ROUTE: PERIOD-VS-PERIOD ZONE COMPARISON ---
+@store_route('/api/compare')
+def api_compare():
+    """
+    Per-zone metrics, deltas and % changes between two periods:
+      /api/compare?date=2026-01-25&basis=wow          same weekday last week (or dod: the day before)
+      /api/compare?current=2026-01-19..2026-01-25&baseline=2026-01-12..2026-01-18
+    dod/wow answers are looked up from kpi_deltas.csv; anything else is two row lookups
+    per zone in the running sums of kpi_prefix.csv, however long the ranges.
+    """
+    from comparisons import BASES, compare_periods, parse_period
+    args = request.args
+    basis = args.get('basis', '').lower()
+    try:
+        if basis:
+            if basis not in BASES or not args.get('date'):
+                raise ValueError(f"use date=YYYY-MM-DD with basis={'|'.join(BASES)}")
+            day, end = parse_period(args['date'])
+            if end != day:
+                raise ValueError(f"basis={basis} compares single days; use current=<range>&baseline=<range> for ranges")
+            current = (day, day)
+            baseline = (day - timedelta(days=BASES[basis]),) * 2
+        else:
+            if not args.get('current') or not args.get('baseline'):
+                raise ValueError("use current=<period>&baseline=<period>, or date=YYYY-MM-DD&basis=dod|wow")
+            current, baseline = parse_period(args['current']), parse_period(args['baseline'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    deltas_file, prefix_file = data_file(DELTAS_FILE), data_file(PREFIX_FILE)
+    if not os.path.exists(prefix_file):
+        return jsonify({'error': 'No compiled comparisons yet. Run kpi_engine.py first.'}), 404
+
+    etag, last_modified = data_version(deltas_file, prefix_file)
+    prefix = kpi_cache.get(prefix_file, load_prefix_index)
+    # Periods that end before the newest compiled day can be kept when the URL pins this
+    # version (?v=<the 'version' field of an earlier answer>)
+    max_age = versioned_max_age(etag, final=bool(prefix.last and max(current[1], baseline[1]) < prefix.last))
+    if not_modified(etag, last_modified):
+        return set_validators(Response(status=304), etag, last_modified, max_age)
+
+    def period(span, days):
+        return {'start': span[0].isoformat(), 'end': span[1].isoformat(), 'days_with_data': days}
 
-@app.route('/ai')
+    entry = None
+    if basis and os.path.exists(deltas_file):
+        entry = kpi_cache.get(deltas_file, load_delta_index).lookup(current[0].isoformat(), basis)
+    if entry is not None:
+        body = {'version': etag, 'basis': basis, 'source': 'precomputed', 'zones': entry['zones'],
+                'current': period(current, 1), 'baseline': period(baseline, 1)}
+    else:
+        # Custom ranges, or a dod/wow pair whose baseline day was never compiled
+        current_zones, current_days = prefix.totals(*current)
+        baseline_zones, baseline_days = prefix.totals(*baseline)
+        body = {'version': etag, 'basis': basis or 'custom', 'source': 'prefix_sums',
+                'zones': compare_periods(current_zones, baseline_zones),
+                'current': period(current, current_days), 'baseline': period(baseline, baseline_days)}
+    return set_validators(jsonify(body), etag, last_modified, max_age)
+
+
+# --- HEATMAP IMAGES (per store) ---
+@store_route('/heatmaps/<filename>')
+def heatmap(filename):
+    folder = os.path.abspath(data_file(STATIC_FOLDER))
+    return cache_heatmap(send_from_directory(folder, filename), filename, folder)
+
+
+# --- NEW ROUTE: LIVE ZONE STATE FROM THE INGESTION SERVICE ---
+@app.route('/api/live')
+def api_live_state():
+    """Relays the rolling occupancy/dwell state kept by live_ingestion.py (polled by the dashboard)."""
+    try:
+        with urllib.request.urlopen(LIVE_STATE_URL, timeout=0.5) as resp:
+            return jsonify(json.load(resp))
+    except Exception:
+        return jsonify({'status': 'offline', 'zones': []})
+
+
+
+@store_route('/ai')
 def ai_reports():
     strategies = load_strategies()
     return render_template('ai.html',page='ai', strategies=strategies)
 
-@app.route('/settings')
+@store_route('/settings')
 def settings():
     return render_template('settings.html',page='settings')
     
 # --- NEW ROUTE: TRIGGERS THE AI MANUALLY ---
-@app.route('/run_intelligence', methods=['POST'])
+@store_route('/run_intelligence', methods=['POST'])
 def run_intelligence():
     try:
         print("⚡ Manual Trigger: Running Intelligence Engine...")
-        generate_insights() 
+        from intelligence_engine import generate_insights
+        generate_insights(input_file=data_file(ANALYTICS_FILE), output_file=data_file(STRATEGY_FILE)) 
         return jsonify({'status': 'success', 'message': 'Analysis Complete'})
     except Exception as e:
         print(f"❌ Error: {e}")
         return jsonify({'status': 'error', 'message': str(e)})    
 
+# --- OBSERVABILITY: PROMETHEUS SCRAPE ENDPOINT ---
+@app.route('/metrics')
+def metrics():
+    """Per-route latency from this worker plus stage timings recorded by the batch pipeline (every store)."""
+    stage_logs = {None: STAGE_LOG, **{store_id: store_path(store_id, STAGE_LOG) for store_id in list_stores()}}
+    lines = request_metrics.render() + kpi_cache.render() + render_stage_metrics(stage_logs)
+    return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+End-to-end pipeline benchmark on synthetic tracking data.
+
+    python benchmarks/bench_pipeline.py --scales 1e6,1e7 --days 6
+    python benchmarks/bench_pipeline.py --compare old.json new.json
+
+Each scale gets a scratch directory with freshly generated data. Every stage runs in
+its own interpreter against it, so the peak RSS reported for a stage (and for its
+pool workers) belongs to that stage alone. Wall time, throughput and peak RSS go to
+a JSON report.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from instrumentation import children_peak_rss_bytes, peak_rss_bytes
+from generate_tracking import generate_dataset
+from clean_atc_data import clean_atc_data
+from zoning_engine import train_zoning_model
+from generate_sales import generate_all_sales
+from kpi_engine import run_kpi_engine
+from generate_heatmap import generate_all_heatmaps
+
+# --- CONFIGURATION ---
+RESULTS_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'results')
+ROWS_PER_SHOPPER = 600      # ~10 minute visits at one fix per second
+
+STAGES = {
+    'clean_atc_data': lambda: [clean_atc_data(f, f.replace('atc-synthetic-', 'mosaic_history_'), nrows=None)
+                               for f in sorted(os.listdir('.')) if f.startswith('atc-synthetic-')],
+    'train_zoning_model': train_zoning_model,
+    'generate_sales': generate_all_sales,
+    'run_kpi_engine': run_kpi_engine,
+    'generate_all_heatmaps': generate_all_heatmaps,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_stage_child(name):
+    """Runs one stage in this (fresh) process; ru_maxrss then covers that stage only."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        STAGES[name]()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'peak_rss_bytes': peak_rss_bytes(),
+                      'children_peak_rss_bytes': children_peak_rss_bytes()}))
+
+
+def measure_stage(name):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-stage', name],
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run_scale(total_rows, n_days, stages, keep=False):
+    results = []
+    n_shoppers = max(total_rows // ROWS_PER_SHOPPER, n_days)
+    work_dir = tempfile.mkdtemp(prefix=f'mosaic-bench-{total_rows}-')
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    os.makedirs('static', exist_ok=True)
+    devnull = open(os.devnull, 'w')
+    try:
+        print(f"\n🧪 Scale {total_rows:,} rows | {n_shoppers:,} shoppers | {n_days} days -> {work_dir}")
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(devnull):
+            if 'clean_atc_data' in stages:
+                generate_dataset(total_rows, n_shoppers, n_days, fmt='atc')
+            else:
+                generate_dataset(total_rows, n_shoppers, n_days)
+        print(f"   generate data: {time.perf_counter() - start:.1f}s")
+
+        for name in stages:
+            child = measure_stage(name)   # Timed inside the child: interpreter start-up is not counted
+            elapsed = child['seconds']
+            results.append({
+                'scale_rows': total_rows,
+                'shoppers': n_shoppers,
+                'days': n_days,
+                'stage': name,
+                'seconds': round(elapsed, 3),
+                'rows_per_second': round(total_rows / elapsed) if elapsed > 0 else None,
+                'peak_rss_bytes': child['peak_rss_bytes'],
+                'children_peak_rss_bytes': child['children_peak_rss_bytes']
+            })
+            print(f"   {name:<24}{elapsed:>9.2f}s  {total_rows / max(elapsed, 1e-9):>14,.0f} rows/s")
+    finally:
+        devnull.close()
+        os.chdir(cwd)
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {(r['scale_rows'], r['stage']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = json.load(f)['results']
+
+    print(f"{'SCALE':>12}  {'STAGE':<24}{'OLD':>10}{'NEW':>10}{'CHANGE':>10}")
+    for r in new:
+        before = old.get((r['scale_rows'], r['stage']))
+        if not before:
+            continue
+        change = (r['seconds'] - before['seconds']) / before['seconds'] * 100 if before['seconds'] else 0.0
+        print(f"{r['scale_rows']:>12,}  {r['stage']:<24}{before['seconds']:>9.2f}s{r['seconds']:>9.2f}s{change:>+9.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Mosaic batch pipeline on synthetic data.")
+    parser.add_argument('--scales', default='1e6,1e7,1e8', help="Comma-separated total row counts")
+    parser.add_argument('--days', type=int, default=6)
+    parser.add_argument('--stages', default=','.join(STAGES), help="Comma-separated subset of stages, run in order")
+    parser.add_argument('--output', default=None, help="Result JSON path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated scratch directories")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two result files and exit")
+    parser.add_argument('--run-stage', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_stage_child(args.run_stage)
+        sys.exit(0)
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    stages = [s for s in args.stages.split(',') if s]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    commit = git_commit()
+    results = []
+    for scale in args.scales.split(','):
+        results.extend(run_scale(int(float(scale)), args.days, stages, keep=args.keep))
+
+    report = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Benchmark results saved to {output}")
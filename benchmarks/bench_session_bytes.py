@@ -0,0 +1,198 @@
+"""
+Bytes transferred per dashboard session.
+
+    python benchmarks/bench_session_bytes.py                  # current tree
+    python benchmarks/bench_session_bytes.py --ref HEAD~1     # before/after against any commit
+    python benchmarks/bench_session_bytes.py --store north    # a store under stores/
+
+Replays one browser session against app.py with Flask's test client: open the
+dashboard (page + static assets + today's heatmap), switch through every date in the
+heatmap dropdown --passes times, then reload the page. A small browser cache sits in
+front of the client: it honours Cache-Control max-age/no-cache, revalidates with
+If-None-Match / If-Modified-Since and advertises gzip (and br when brotli is installed).
+The /api/live poll is left out: it is real-time and never cacheable.
+"""
+import os
+import re
+import sys
+import json
+import gzip
+import shutil
+import argparse
+import subprocess
+
+from bench_startup import PROJECT_DIR, export_ref
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- CONFIGURATION ---
+ACCEPT_ENCODING = 'gzip, br' if brotli is not None else 'gzip'
+STEP_SECONDS = 5     # Simulated time between clicks
+DATE_OPTION = re.compile(r'value="heatmap_(\d{4}-\d{2}-\d{2})\.png"')
+ASSET = re.compile(r'(?:src|href)="(/[^"]+\.(?:css|js|png))"')
+HEATMAP_SRC = re.compile(r'src="([^"]*/)heatmap_\d{4}-\d{2}-\d{2}\.png"')   # Where this page loads heatmaps from
+# URL templates the dashboard's script fills in on a date switch (versioned URLs, ?v=...)
+HEATMAP_URL = re.compile(r'"([^"]*FILE[^"]*)"\.replace\(\'FILE\'')
+API_URL = re.compile(r'"([^"]*DATE[^"]*)"\.replace\(\'DATE\'')
+
+
+# --- BROWSER SIMULATION ---
+class BrowserCache:
+    def __init__(self, client):
+        self.client = client
+        self.entries = {}   # url -> {'etag', 'last_modified', 'expires', 'body'}
+        self.now = 0
+        self.stats = {'requests': 0, 'full': 0, 'not_modified': 0, 'cache_hits': 0,
+                      'body_bytes': 0, 'header_bytes': 0, 'bytes_by_kind': {}}
+
+    def get(self, url):
+        self.now += STEP_SECONDS
+        entry = self.entries.get(url)
+        if entry and entry['expires'] > self.now:
+            self.stats['cache_hits'] += 1
+            return entry['body']
+
+        headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        resp = self.client.get(url, headers=headers)
+
+        raw = resp.get_data()
+        header_bytes = len(f'HTTP/1.1 {resp.status}\r\n') + sum(
+            len(k) + len(v) + 4 for k, v in resp.headers.items()) + 2
+        self.stats['requests'] += 1
+        self.stats['body_bytes'] += len(raw)
+        self.stats['header_bytes'] += header_bytes
+        by_kind = self.stats['bytes_by_kind']
+        by_kind[kind_of(url)] = by_kind.get(kind_of(url), 0) + len(raw) + header_bytes
+
+        cc = resp.cache_control
+        max_age = 0 if cc.no_cache or cc.no_store else (cc.max_age or 0)
+        if resp.status_code == 304 and entry:
+            self.stats['not_modified'] += 1
+            entry['expires'] = self.now + max_age
+            return entry['body']
+
+        self.stats['full'] += 1
+        body = decode(raw, resp.headers.get('Content-Encoding'))
+        if not cc.no_store and (resp.headers.get('ETag') or resp.headers.get('Last-Modified') or max_age):
+            self.entries[url] = {'etag': resp.headers.get('ETag'), 'last_modified': resp.headers.get('Last-Modified'),
+                                 'expires': self.now + max_age, 'body': body}
+        return body
+
+
+def kind_of(url):
+    if '/api/' in url:
+        return 'api'
+    if '/heatmap_' in url:
+        return 'heatmap'
+    return 'asset' if url.startswith('/static/') else 'html'
+
+
+def decode(raw, encoding):
+    if encoding == 'gzip':
+        return gzip.decompress(raw)
+    if encoding == 'br':
+        return brotli.decompress(raw)
+    return raw
+
+
+def run_session(passes, prefix=''):
+    import app   # The tree under test is first on sys.path (see measure)
+    browser = BrowserCache(app.app.test_client())
+
+    def open_dashboard():
+        html = browser.get(f'{prefix}/dashboard').decode()
+        dates = DATE_OPTION.findall(html)
+        heatmap_url, api_url = HEATMAP_URL.search(html), API_URL.search(html)
+        if heatmap_url and api_url:
+            heatmap_url, api_url = heatmap_url.group(1), api_url.group(1)
+        else:
+            # Trees before the dashboard built these URLs in its script
+            match = HEATMAP_SRC.search(html)
+            heatmap_url = (match.group(1) if match else '/static/') + 'FILE'
+            api_url = f'{prefix}/api/dashboard/DATE'
+        for asset in dict.fromkeys(ASSET.findall(html)):
+            if dates and asset == heatmap_url.replace('FILE', f'heatmap_{dates[0]}.png'):
+                continue   # Today's heatmap is fetched below, like the other days
+            browser.get(asset)
+        if dates:
+            browser.get(heatmap_url.replace('FILE', f'heatmap_{dates[0]}.png'))
+        return dates, heatmap_url, api_url
+
+    dates, heatmap_url, api_url = open_dashboard()
+    for _ in range(passes):
+        for date in dates:
+            browser.get(heatmap_url.replace('FILE', f'heatmap_{date}.png'))
+            browser.get(api_url.replace('DATE', date))
+    open_dashboard()
+
+    stats = browser.stats
+    stats['dates'] = len(dates)
+    stats['total_bytes'] = stats['body_bytes'] + stats['header_bytes']
+    return stats
+
+
+def measure(code_dir, data_dir, passes, store=None):
+    """Runs the session in a fresh interpreter so each tree's app.py is imported cleanly."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', code_dir, '--passes', str(passes)]
+    if store:
+        cmd += ['--store', store]
+    out = subprocess.run(cmd, cwd=data_dir, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def print_report(results):
+    print(f"\n{'TREE':<14}{'REQS':>6}{'200':>6}{'304':>6}{'CACHED':>8}{'BODY KB':>11}{'HEADER KB':>11}{'TOTAL KB':>11}")
+    for label, r in results.items():
+        print(f"{label:<14}{r['requests']:>6}{r['full']:>6}{r['not_modified']:>6}{r['cache_hits']:>8}"
+              f"{r['body_bytes'] / 1024:>11.1f}{r['header_bytes'] / 1024:>11.1f}{r['total_bytes'] / 1024:>11.1f}")
+    kinds = sorted({k for r in results.values() for k in r['bytes_by_kind']})
+    print(f"\n{'TREE':<14}" + ''.join(f"{kind.upper() + ' KB':>12}" for kind in kinds))
+    for label, r in results.items():
+        print(f"{label:<14}" + ''.join(f"{r['bytes_by_kind'].get(kind, 0) / 1024:>12.1f}" for kind in kinds))
+    if len(results) == 2:
+        before, after = results.values()
+        print(f"\n📦 bytes per session: {before['total_bytes']:,} -> {after['total_bytes']:,} "
+              f"({after['total_bytes'] / before['total_bytes']:.2f}x), "
+              f"requests: {before['requests']} -> {after['requests']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure bytes transferred per dashboard session.")
+    parser.add_argument('--ref', default=None, help="Also measure this git ref (the 'before' tree)")
+    parser.add_argument('--passes', type=int, default=3, help="Times the user cycles through every date")
+    parser.add_argument('--data-dir', default='.', help="Directory with the KPI CSVs the app serves")
+    parser.add_argument('--store', default=None, help="Store id under stores/ (default: the data directory's own store)")
+    parser.add_argument('--output', default=None, help="Optional JSON report path")
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, args.child)
+        print(json.dumps(run_session(args.passes, prefix=f'/stores/{args.store}' if args.store else '')))
+        sys.exit(0)
+
+    data_dir = os.path.abspath(args.data_dir)
+    results = {}
+    if args.ref:
+        ref_dir = export_ref(args.ref)
+        try:
+            print(f"🌐 Replaying a session against {args.ref}...")
+            results[args.ref] = measure(ref_dir, data_dir, args.passes, args.store)
+        finally:
+            shutil.rmtree(ref_dir, ignore_errors=True)
+    print(f"🌐 Replaying a session against the working tree...")
+    results['working tree'] = measure(PROJECT_DIR, data_dir, args.passes, args.store)
+
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Report saved to {args.output}")
@@ -0,0 +1,129 @@
+"""
+Web-layer cold start benchmark.
+
+    python benchmarks/bench_startup.py                    # current tree
+    python benchmarks/bench_startup.py --ref HEAD~1       # before/after against any commit
+    python benchmarks/bench_startup.py --importtime 15    # slowest imports of the current tree
+
+Each run is a fresh interpreter started in the data directory (default: the current
+one). It reports interpreter + `import app` time, the first /dashboard request (where
+lazily imported modules are now paid for) and which heavy modules were loaded by the import.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --- CONFIGURATION ---
+HEAVY_MODULES = ('pandas', 'numpy', 'groq', 'dotenv', 'sklearn', 'matplotlib')
+
+CHILD = r'''
+import sys, json, time
+sys.path.insert(0, sys.argv[1])   # Ahead of the data directory, which may hold its own copy of app.py
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+heavy = [m for m in %r if m in sys.modules]
+app.app.test_client().get('/dashboard')
+served = time.perf_counter()
+print(json.dumps({'import_s': imported - start, 'first_request_s': served - imported, 'heavy_modules': heavy}))
+''' % (HEAVY_MODULES,)
+
+
+# --- MEASUREMENT ---
+def export_ref(ref):
+    """Checks a commit's tree out into a temp dir without touching the working copy."""
+    target = tempfile.mkdtemp(prefix='mosaic-startup-')
+    archive = subprocess.run(['git', '-C', PROJECT_DIR, 'archive', ref], check=True, capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', target], input=archive, check=True)
+    return target
+
+
+def measure(code_dir, data_dir, runs):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', CHILD, code_dir], cwd=data_dir, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        wall = time.perf_counter() - start
+        result = json.loads(out.strip().splitlines()[-1])
+        result['process_s'] = wall - result['first_request_s']   # Interpreter start + import
+        samples.append(result)
+
+    def median_ms(key):
+        return round(statistics.median(s[key] for s in samples) * 1000, 1)
+
+    return {
+        'runs': runs,
+        'import_ms': median_ms('import_s'),
+        'process_start_ms': median_ms('process_s'),
+        'first_request_ms': median_ms('first_request_s'),
+        'heavy_modules_at_import': samples[0]['heavy_modules']
+    }
+
+
+def slowest_imports(code_dir, data_dir, top):
+    env = dict(os.environ)
+    code = f'import sys; sys.path.insert(0, {code_dir!r}); import app'
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=data_dir,
+                         env=env, capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def print_report(results):
+    print(f"\n{'TREE':<14}{'IMPORT':>10}{'PROCESS':>10}{'1ST REQ':>10}  HEAVY MODULES AT IMPORT")
+    for label, r in results.items():
+        print(f"{label:<14}{r['import_ms']:>8.1f}ms{r['process_start_ms']:>8.1f}ms{r['first_request_ms']:>8.1f}ms  "
+              f"{', '.join(r['heavy_modules_at_import']) or '-'}")
+    if len(results) == 2:
+        before, after = results.values()
+        print(f"\n⏱️  import: {before['import_ms']:.1f}ms -> {after['import_ms']:.1f}ms "
+              f"({after['import_ms'] / before['import_ms']:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure app.py cold start time.")
+    parser.add_argument('--ref', default=None, help="Also measure this git ref (the 'before' tree)")
+    parser.add_argument('--runs', type=int, default=7, help="Fresh interpreters per tree (median reported)")
+    parser.add_argument('--data-dir', default='.', help="Directory with the KPI CSVs the app serves")
+    parser.add_argument('--importtime', type=int, default=0, metavar='N', help="Show the N slowest imports")
+    parser.add_argument('--output', default=None, help="Optional JSON report path")
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(args.data_dir)
+    results = {}
+    if args.ref:
+        ref_dir = export_ref(args.ref)
+        try:
+            print(f"🚀 Measuring {args.ref} ({args.runs} runs)...")
+            results[args.ref] = measure(ref_dir, data_dir, args.runs)
+        finally:
+            shutil.rmtree(ref_dir, ignore_errors=True)
+    print(f"🚀 Measuring working tree ({args.runs} runs)...")
+    results['working tree'] = measure(PROJECT_DIR, data_dir, args.runs)
+
+    print_report(results)
+
+    if args.importtime:
+        print(f"\n{'CUMULATIVE':>12}  MODULE")
+        for cumulative, name in slowest_imports(PROJECT_DIR, data_dir, args.importtime):
+            print(f"{cumulative / 1000:>10.1f}ms  {name}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Report saved to {args.output}")
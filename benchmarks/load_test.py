@@ -0,0 +1,231 @@
+"""
+Local HTTP load test for the Flask app.
+
+    python benchmarks/load_test.py --history-days 365 --rps 200 --duration 30
+    python benchmarks/load_test.py --server gunicorn --workers 4 --output load.json
+
+Builds a fixture data directory with the requested history length, starts app.py
+against it, drives a weighted request mix at a fixed arrival rate (open loop) and
+reports p50/p95/p99 latency, throughput and error rate per route. Latency is measured
+from each request's scheduled send time, so time spent queued in the client while the
+server falls behind counts against it (no coordinated omission); how late requests
+actually went out is reported separately as send lag. With --slo-p95-ms /
+--slo-error-rate each route is checked against the SLO and the exit code reflects it.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --- CONFIGURATION ---
+ZONES = ['Beauty', 'Electronics', 'Groceries', 'Home']
+# Route label -> (weight, path builder). Dashboard date switches dominate real sessions.
+REQUEST_MIX = {
+    '/dashboard': (0.35, lambda dates: '/dashboard'),
+    '/api/dashboard/<date>': (0.50, lambda dates: f'/api/dashboard/{random.choice(dates)}'),
+    '/analytics': (0.15, lambda dates: '/analytics'),
+}
+
+
+# --- FIXTURE DATA ---
+def build_fixture(history_days, seed=7):
+    """Writes historical_analytics.csv / zone_analytics.csv with history_days days of 4 zones."""
+    rng = random.Random(seed)
+    fixture_dir = tempfile.mkdtemp(prefix=f'mosaic-load-{history_days}d-')
+    start = datetime(2026, 1, 20) - timedelta(days=history_days - 1)
+
+    rows, dates = [], []
+    for d in range(history_days):
+        date = (start + timedelta(days=d)).strftime('%Y-%m-%d')
+        dates.append(date)
+        for zone in ZONES:
+            visitors = rng.randint(50, 300)
+            transactions = rng.randint(1, max(visitors // 5, 2))
+            rows.append((date, zone, visitors, round(rng.uniform(3, 14), 1), transactions,
+                         round(transactions / visitors * 100, 2), rng.randint(80, 12000)))
+
+    header = 'Date,Zone_Name,Visitors,Avg_Dwell_Time,Transactions,Conversion_Rate,Revenue\n'
+    with open(os.path.join(fixture_dir, 'historical_analytics.csv'), 'w') as f:
+        f.write(header)
+        f.writelines(','.join(map(str, r)) + '\n' for r in rows)
+    with open(os.path.join(fixture_dir, 'zone_analytics.csv'), 'w') as f:
+        f.write(header.split(',', 1)[1])
+        f.writelines(','.join(map(str, r[1:])) + '\n' for r in rows[-len(ZONES):])
+    return fixture_dir, dates
+
+
+# --- SERVER ---
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(fixture_dir, port, server='flask', workers=2):
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    if server == 'gunicorn':
+        # Same config as production (preload + shared data), with the CLI overriding bind/workers
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(PROJECT_DIR, 'gunicorn.conf.py'),
+               '--chdir', fixture_dir, '--workers', str(workers),
+               '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+    else:
+        cmd = [sys.executable, '-c',
+               f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True, debug=False)"]
+    proc = subprocess.Popen(cmd, cwd=fixture_dir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{server} exited during startup (code {proc.returncode})")
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/dashboard', timeout=1).read()
+            return proc
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{server} did not become ready on port {port}")
+
+
+# --- LOAD GENERATION ---
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_load(base_url, dates, rps, duration, concurrency):
+    labels = list(REQUEST_MIX)
+    weights = [REQUEST_MIX[label][0] for label in labels]
+    samples = {label: [] for label in labels}
+    send_lags = {label: [] for label in labels}
+    errors = {label: 0 for label in labels}
+    lock = threading.Lock()
+
+    def fire(label, path, scheduled):
+        send_lag = time.perf_counter() - scheduled   # Time queued behind busy client threads
+        ok = False
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=10) as resp:
+                resp.read()
+                ok = 200 <= resp.status < 400
+        except (urllib.error.URLError, http.client.HTTPException, OSError):
+            pass   # Refused, reset, timed out or cut short (IncompleteRead): counted as an error below
+        except Exception as e:
+            print(f"   ⚠️ Unexpected client error on {path}: {e!r}")
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            samples[label].append(elapsed)
+            send_lags[label].append(send_lag)
+            if not ok:
+                errors[label] += 1
+
+    # Open loop: requests are issued on schedule regardless of how fast earlier ones return
+    total = int(rps * duration)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            label = random.choices(labels, weights)[0]
+            pool.submit(fire, label, REQUEST_MIX[label][1](dates), scheduled)
+    wall = time.perf_counter() - start
+
+    report = {}
+    for label in labels:
+        lat = sorted(samples[label])
+        lag = sorted(send_lags[label])
+        report[label] = {
+            'requests': len(lat),
+            'throughput_rps': round(len(lat) / wall, 1),
+            'error_rate': round(errors[label] / len(lat), 4) if lat else 0.0,
+            'p50_ms': round(percentile(lat, 50) * 1000, 2) if lat else None,
+            'p95_ms': round(percentile(lat, 95) * 1000, 2) if lat else None,
+            'p99_ms': round(percentile(lat, 99) * 1000, 2) if lat else None,
+            'send_lag_p99_ms': round(percentile(lag, 99) * 1000, 2) if lag else None,
+            'send_lag_max_ms': round(lag[-1] * 1000, 2) if lag else None,
+        }
+    return report, wall
+
+
+def check_slo(report, p95_ms=None, error_rate=None):
+    """Marks each route PASS/FAIL against the SLO; returns True when every route passes."""
+    ok = True
+    for r in report.values():
+        breaches = []
+        if p95_ms is not None and r['p95_ms'] is not None and r['p95_ms'] > p95_ms:
+            breaches.append('p95')
+        if error_rate is not None and r['error_rate'] > error_rate:
+            breaches.append('errors')
+        r['slo'] = 'FAIL (' + ', '.join(breaches) + ')' if breaches else 'PASS'
+        ok = ok and not breaches
+    return ok
+
+
+def print_report(report, wall):
+    print(f"\n{'ROUTE':<24}{'REQS':>8}{'RPS':>9}{'ERR%':>8}{'P50ms':>10}{'P95ms':>10}{'P99ms':>10}"
+          f"{'LAG99ms':>10}{'LAGMAXms':>10}  SLO")
+    for label, r in report.items():
+        if not r['requests']:
+            continue
+        print(f"{label:<24}{r['requests']:>8}{r['throughput_rps']:>9.1f}{r['error_rate'] * 100:>7.2f}%"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['send_lag_p99_ms']:>10.2f}{r['send_lag_max_ms']:>10.2f}  {r.get('slo', '-')}")
+    total = sum(r['requests'] for r in report.values())
+    print(f"\n⏱️  {total} requests in {wall:.1f}s ({total / wall:.1f} req/s achieved)")
+    print("   Latency counts from each request's scheduled send time; LAG is how late it actually went out.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Mosaic Flask app against fixture data.")
+    parser.add_argument('--history-days', type=int, default=180, help="Days of history in the fixture CSV")
+    parser.add_argument('--rps', type=float, default=50, help="Target arrival rate (requests per second)")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds of load")
+    parser.add_argument('--concurrency', type=int, default=32, help="Client threads")
+    parser.add_argument('--server', choices=['flask', 'gunicorn'], default='flask')
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn workers")
+    parser.add_argument('--slo-p95-ms', type=float, default=None, help="Fail if any route's p95 exceeds this")
+    parser.add_argument('--slo-error-rate', type=float, default=None, help="Fail if any route's error rate exceeds this (0-1)")
+    parser.add_argument('--output', default=None, help="Optional JSON report path")
+    args = parser.parse_args()
+
+    fixture_dir, dates = build_fixture(args.history_days)
+    port = free_port()
+    print(f"🚦 Starting {args.server} against {args.history_days} days of history ({fixture_dir})")
+    proc = start_server(fixture_dir, port, server=args.server, workers=args.workers)
+    try:
+        print(f"   Driving {args.rps:g} req/s for {args.duration:g}s...")
+        report, wall = run_load(f'http://127.0.0.1:{port}', dates, args.rps, args.duration, args.concurrency)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+
+    slo_ok = check_slo(report, args.slo_p95_ms, args.slo_error_rate)
+    print_report(report, wall)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'history_days': args.history_days, 'target_rps': args.rps, 'duration': args.duration,
+                'server': args.server, 'workers': args.workers, 'routes': report
+            }, f, indent=2)
+        print(f"💾 Report saved to {args.output}")
+
+    sys.exit(0 if slo_ok else 1)
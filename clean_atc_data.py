@@ -4,6 +4,7 @@ import os
 # --- CONFIGURATION ---
 INPUT_FILE = "atc-20121125.csv"       # The file you renamed
 OUTPUT_FILE = "mosaic_history_1125.csv" # The file your Heatmap/Dashboard needs
+MAX_ROWS = 500000                       # Loading 500k rows for demo speed (None = whole file)
 
 # 1. STORE BOUNDARIES (Keep data INSIDE this box)
 # Coordinates in ATC are usually millimeters.
@@ -46,68 +47,72 @@ RESTRICTED_ZONES = [
     (14000, 15000, 0, 15000),    # Right Edge Buffer
 ]
 
-print(f"⏳ Looking for {INPUT_FILE}...")
+def clean_atc_data(input_file=INPUT_FILE, output_file=OUTPUT_FILE, nrows=MAX_ROWS):
+    print(f"⏳ Looking for {input_file}...")
 
-if not os.path.exists(INPUT_FILE):
-    print(f"❌ Error: Could not find '{INPUT_FILE}'.")
-    print("   Please rename your downloaded ATC file to 'atc_raw.csv' and place it here.")
-    exit()
+    if not os.path.exists(input_file):
+        print(f"❌ Error: Could not find '{input_file}'.")
+        print("   Please rename your downloaded ATC file to 'atc_raw.csv' and place it here.")
+        return None
 
-# --- STEP 1: LOAD DATA ---
-print("   Loading dataset (this might take a moment)...")
+    # --- STEP 1: LOAD DATA ---
+    print("   Loading dataset (this might take a moment)...")
 
-column_names = ["time", "person_id", "x", "y", "z", "velocity", "angle", "facing"]
+    column_names = ["time", "person_id", "x", "y", "z", "velocity", "angle", "facing"]
 
-try:
-    # Loading 500k rows for demo speed
-    df = pd.read_csv(INPUT_FILE, names=column_names, header=None, nrows=500000)
-except Exception as e:
-    print(f"❌ Error reading CSV: {e}")
-    exit()
+    try:
+        df = pd.read_csv(input_file, names=column_names, header=None, nrows=nrows)
+    except Exception as e:
+        print(f"❌ Error reading CSV: {e}")
+        return None
 
-print(f"   Loaded {len(df)} rows.")
+    print(f"   Loaded {len(df)} rows.")
 
-# --- STEP 2: CROP TO STORE BOUNDARIES ---
-print("   Cropping to store boundaries...")
-df_shop = df[
-    (df['x'] >= X_MIN) & (df['x'] <= X_MAX) &
-    (df['y'] >= Y_MIN) & (df['y'] <= Y_MAX)
-].copy()
+    # --- STEP 2: CROP TO STORE BOUNDARIES ---
+    print("   Cropping to store boundaries...")
+    df_shop = df[
+        (df['x'] >= X_MIN) & (df['x'] <= X_MAX) &
+        (df['y'] >= Y_MIN) & (df['y'] <= Y_MAX)
+    ].copy()
 
-if df_shop.empty:
-    print("⚠️ Warning: Crop resulted in 0 rows. Check your X/Y MIN/MAX values.")
-    exit()
+    if df_shop.empty:
+        print("⚠️ Warning: Crop resulted in 0 rows. Check your X/Y MIN/MAX values.")
+        return None
 
-print(f"   Rows inside store: {len(df_shop)}")
+    print(f"   Rows inside store: {len(df_shop)}")
 
-# --- STEP 3: NORMALIZE COORDINATES ---
-# Shift coordinates so the store starts at (0,0)
-df_shop['x'] = df_shop['x'] - X_MIN
-df_shop['y'] = df_shop['y'] - Y_MIN
+    # --- STEP 3: NORMALIZE COORDINATES ---
+    # Shift coordinates so the store starts at (0,0)
+    df_shop['x'] = df_shop['x'] - X_MIN
+    df_shop['y'] = df_shop['y'] - Y_MIN
 
-# --- STEP 3.5: REMOVE POINTS INSIDE WALLS/SHELVES ---
-print("   Filtering out aisles and shelf boundaries...")
-initial_count = len(df_shop)
+    # --- STEP 3.5: REMOVE POINTS INSIDE WALLS/SHELVES ---
+    print("   Filtering out aisles and shelf boundaries...")
+    initial_count = len(df_shop)
 
-for (r_xmin, r_xmax, r_ymin, r_ymax) in RESTRICTED_ZONES:
-    # We keep only the rows that are NOT inside the restricted rectangle
-    df_shop = df_shop[~((df_shop['x'] >= r_xmin) & (df_shop['x'] <= r_xmax) &
-                        (df_shop['y'] >= r_ymin) & (df_shop['y'] <= r_ymax))]
+    for (r_xmin, r_xmax, r_ymin, r_ymax) in RESTRICTED_ZONES:
+        # We keep only the rows that are NOT inside the restricted rectangle
+        df_shop = df_shop[~((df_shop['x'] >= r_xmin) & (df_shop['x'] <= r_xmax) &
+                            (df_shop['y'] >= r_ymin) & (df_shop['y'] <= r_ymax))]
 
-removed_count = initial_count - len(df_shop)
-print(f"   Removed {removed_count} noise points found inside solid objects.")
+    removed_count = initial_count - len(df_shop)
+    print(f"   Removed {removed_count} noise points found inside solid objects.")
 
-# --- STEP 4: CLEANUP ---
-final_df = df_shop[['time', 'person_id', 'x', 'y', 'velocity']]
+    # --- STEP 4: CLEANUP ---
+    final_df = df_shop[['time', 'person_id', 'x', 'y', 'velocity']]
 
-start_time = final_df['time'].min()
-final_df['time'] = final_df['time'] - start_time
+    start_time = final_df['time'].min()
+    final_df['time'] = final_df['time'] - start_time
 
-if final_df['time'].max() > 100000: 
-    final_df['time'] = final_df['time'] / 1000
+    if final_df['time'].max() > 100000: 
+        final_df['time'] = final_df['time'] / 1000
 
-final_df['time'] = final_df['time'].astype(int)
+    final_df['time'] = final_df['time'].astype(int)
 
-# --- SAVE ---
-final_df.to_csv(OUTPUT_FILE, index=False)
-print(f"✅ Success! Created '{OUTPUT_FILE}' with {len(final_df)} rows.")
\ No newline at end of file
+    # --- SAVE ---
+    final_df.to_csv(output_file, index=False)
+    print(f"✅ Success! Created '{output_file}' with {len(final_df)} rows.")
+    return final_df
+
+if __name__ == "__main__":
+    clean_atc_data()
@@ -0,0 +1,207 @@
+import sys
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+
+# --- CONFIGURATION ---
+# Comparisons the KPI engine precomputes: days between a date and its baseline
+BASES = {'dod': 1, 'wow': 7}
+METRICS = ['Visitors', 'Transactions', 'Revenue', 'Conversion_Rate', 'Avg_Dwell_Time']
+COUNTS = ['Visitors', 'Transactions', 'Revenue']   # Additive; rates are recomputed from the sums
+# Running totals per zone over a gap-free calendar. A range [start, end] is cum[end] - cum[start - 1]
+SUMS = {
+    'Visitors': 'Cum_Visitors',
+    'Transactions': 'Cum_Transactions',
+    'Revenue': 'Cum_Revenue',
+    'Dwell_Visitors': 'Cum_Dwell_Visitors',   # Avg_Dwell_Time * Visitors, for a visitor-weighted mean
+    'Days': 'Cum_Days',                       # Days the zone actually has data
+}
+
+
+# --- SHARED FORMULAS ---
+def pct_change(current, base):
+    """Relative change in %; None when there is no baseline to divide by."""
+    if not base or pd.isna(base):
+        return None
+    return round((current - base) / base * 100, 2)
+
+
+def period_metrics(visitors, transactions, revenue, dwell_visitors):
+    """Metrics for a period from its sums, using the same formulas as a single compiled day."""
+    return {
+        'Visitors': int(visitors),
+        'Transactions': int(transactions),
+        'Revenue': int(revenue),
+        'Conversion_Rate': round(transactions / visitors * 100, 2) if visitors else 0.0,
+        'Avg_Dwell_Time': round(dwell_visitors / visitors, 1) if visitors else 0.0,
+    }
+
+
+def zone_delta(zone, current, baseline):
+    """Delta in each metric's own units (percentage points for Conversion_Rate) plus % change."""
+    return {
+        'Zone_Name': zone,
+        'current': current,
+        'baseline': baseline,
+        'delta': {m: round(current[m] - baseline[m], 2) for m in METRICS},
+        'pct_change': {m: pct_change(current[m], baseline[m]) for m in METRICS},
+    }
+
+
+def compare_periods(current, baseline):
+    """
+    current / baseline: zone -> metrics. Every zone with data on either side is reported;
+    a zone missing on one side counts as zero there (same rule as build_deltas).
+    """
+    empty = period_metrics(0, 0, 0, 0)
+    return [zone_delta(zone, current.get(zone, empty), baseline.get(zone, empty))
+            for zone in sorted(set(current) | set(baseline))]
+
+
+def parse_period(text):
+    """'YYYY-MM-DD' or 'YYYY-MM-DD..YYYY-MM-DD' (inclusive) -> (start, end). Raises ValueError."""
+    start, _, end = (text or '').partition('..')
+    start = date.fromisoformat(start.strip())
+    end = date.fromisoformat(end.strip()) if end else start
+    if end < start:
+        raise ValueError(f"period ends before it starts: {text}")
+    return start, end
+
+
+# --- COMPILE TIME (kpi_engine) ---
+def _flat(master_df):
+    df = master_df.copy()
+    df['Date'] = df['Date'].astype(str)
+    df['Zone_Name'] = df['Zone_Name'].astype(str)
+    return df
+
+
+def build_deltas(master_df):
+    """
+    One row per (Date, Basis, Zone_Name) for every compiled day whose baseline day
+    (1 day back for dod, 7 for wow) was compiled too, with both days' metrics, the
+    delta and the % change. Zones with data on either day are kept and count as zero
+    on the day they are missing. The web app answers these comparisons by lookup.
+    """
+    df = _flat(master_df)
+    compiled = set(df['Date'])
+    frames = []
+    for basis, days in BASES.items():
+        base = df.copy()
+        base['Date'] = (pd.to_datetime(base['Date']) + pd.Timedelta(days=days)).dt.strftime('%Y-%m-%d')
+        merged = df.merge(base, on=['Date', 'Zone_Name'], how='outer', suffixes=('', '_Base'))
+        merged['Base_Date'] = (pd.to_datetime(merged['Date']) - pd.Timedelta(days=days)).dt.strftime('%Y-%m-%d')
+        merged = merged[merged['Date'].isin(compiled) & merged['Base_Date'].isin(compiled)].copy()
+        values = [col for m in METRICS for col in (m, f'{m}_Base')]
+        merged[values] = merged[values].fillna(0)
+        merged['Basis'] = basis
+        for m in METRICS:
+            current, previous = merged[m], merged[f'{m}_Base']
+            merged[f'{m}_Delta'] = (current - previous).round(2)
+            merged[f'{m}_Pct'] = ((current - previous) / previous.where(previous != 0) * 100).round(2)
+        frames.append(merged)
+
+    columns = ['Date', 'Basis', 'Base_Date', 'Zone_Name'] + [
+        col for m in METRICS for col in (m, f'{m}_Base', f'{m}_Delta', f'{m}_Pct')]
+    deltas = pd.concat(frames, ignore_index=True)[columns]
+    return deltas.sort_values(['Date', 'Basis', 'Zone_Name'], ignore_index=True)
+
+
+def build_prefix(master_df):
+    """Inclusive running sums per zone for every calendar day from the first compiled date to the last."""
+    df = _flat(master_df)
+    df['Dwell_Visitors'] = df['Avg_Dwell_Time'] * df['Visitors']
+    df['Days'] = 1
+
+    days = pd.date_range(df['Date'].min(), df['Date'].max(), freq='D').strftime('%Y-%m-%d')
+    grid = pd.MultiIndex.from_product([days, sorted(df['Zone_Name'].unique())], names=['Date', 'Zone_Name'])
+    daily = df.groupby(['Date', 'Zone_Name'])[list(SUMS)].sum().reindex(grid, fill_value=0)
+    prefix = daily.groupby(level='Zone_Name').cumsum().rename(columns=SUMS)
+    return prefix.reset_index()
+
+
+# --- SERVE TIME (app) ---
+class DeltaIndex:
+    """Precomputed dod/wow comparisons keyed by (date, basis): each query is one dict lookup."""
+
+    def __init__(self, deltas_df):
+        self.entries = {}
+        for row in deltas_df.to_dict('records'):
+            current = {m: row[m] for m in METRICS}
+            baseline = {m: row[f'{m}_Base'] for m in METRICS}
+            entry = self.entries.setdefault((str(row['Date']), str(row['Basis'])),
+                                            {'base_date': str(row['Base_Date']), 'zones': []})
+            entry['zones'].append({
+                'Zone_Name': str(row['Zone_Name']),
+                'current': _plain(current),
+                'baseline': _plain(baseline),
+                'delta': _plain({m: row[f'{m}_Delta'] for m in METRICS}),
+                'pct_change': {m: None if pd.isna(row[f'{m}_Pct']) else float(row[f'{m}_Pct']) for m in METRICS},
+            })
+
+        self.nbytes = _deep_sizeof(self.entries)   # For the shared cache's byte budget
+
+    def lookup(self, day, basis):
+        return self.entries.get((day, basis))
+
+
+def _deep_sizeof(obj):
+    """Bytes held by nested dicts / lists / tuples of scalars (what DeltaIndex keeps)."""
+    size, stack, seen = 0, [obj], set()
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return size
+
+
+def _plain(metrics):
+    """numpy scalars -> JSON-serialisable ints / floats."""
+    return {m: int(v) if m in COUNTS else float(v) for m, v in metrics.items()}
+
+
+class PrefixIndex:
+    """
+    Per-zone running sums as (days + 1, zones) arrays with a leading zero row, so the
+    totals of any date range cost two row lookups per column whatever its length.
+    """
+
+    def __init__(self, prefix_df):
+        days = sorted(prefix_df['Date'].astype(str).unique())
+        self.first = date.fromisoformat(days[0]) if days else None
+        self.n_days = len(days)
+        self.zones = sorted(prefix_df['Zone_Name'].astype(str).unique())
+        self.cum = {}
+        for col, cum_col in SUMS.items():
+            table = prefix_df.pivot(index='Date', columns='Zone_Name', values=cum_col)
+            values = table.reindex(index=days, columns=self.zones).to_numpy()
+            self.cum[col] = np.vstack([np.zeros((1, len(self.zones)), dtype=values.dtype), values])
+        self.nbytes = sum(a.nbytes for a in self.cum.values())
+
+    @property
+    def last(self):
+        return self.first + timedelta(days=self.n_days - 1) if self.first else None
+
+    def totals(self, start, end):
+        """
+        zone -> metrics for [start, end], clipped to the compiled days, for the zones with
+        data in that range, plus the number of days with data.
+        """
+        if self.first is None:
+            return {}, 0
+        lo = max((start - self.first).days, 0)
+        hi = min((end - self.first).days + 1, self.n_days)
+        if hi <= lo:
+            return {}, 0
+        sums = {col: cum[hi] - cum[lo] for col, cum in self.cum.items()}
+        metrics = {zone: period_metrics(sums['Visitors'][i], sums['Transactions'][i],
+                                        sums['Revenue'][i], sums['Dwell_Visitors'][i])
+                   for i, zone in enumerate(self.zones) if sums['Days'][i] > 0}
+        return metrics, int(sums['Days'].max())
@@ -3,12 +3,16 @@ import numpy as np
 import random
 import os
 import glob
-import pickle
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from itertools import repeat
+
+from schemas import read_tracking
+from zone_model import MODEL_FILE, load_zone_model
 
 # --- 1. CONFIGURATION ---
 BASE_SIMULATION_DATE = datetime(2026, 1, 20, 9, 0, 0) # Starting date for our historical time-series
-MODEL_FILE = 'zone_model.pkl'
+MAX_WORKERS = int(os.getenv('MOSAIC_WORKERS', os.cpu_count() or 1))
 
 # Product Catalog
 zones_catalog = {
@@ -17,56 +21,29 @@ zones_catalog = {
     'Home':        {'products': ['Lamp', 'Cushion', 'Frame'], 'price': [15, 80]},
     'Beauty':      {'products': ['Perfume', 'Lipstick', 'Skincare Set'], 'price': [30, 150]}
 }
+GENERIC_PRICE = [20, 120]   # Zones from a custom layout (zone_layout.json) the catalog does not list
 
-# --- 2. LOAD AI MODEL & MAPPING ---
-if not os.path.exists(MODEL_FILE):
-    print(f"❌ Error: '{MODEL_FILE}' not found. Please run zoning_engine.py first.")
-    exit()
-
-with open(MODEL_FILE, 'rb') as f:
-    kmeans = pickle.load(f)
-
-# EXACT mapping function from kpi_engine.py to guarantee synchronization
-def assign_zone_names_dynamically(kmeans_model):
-    centers = kmeans_model.cluster_centers_
-    mapping = {}
-    points = [(i, c[0], c[1]) for i, c in enumerate(centers)]
-    points.sort(key=lambda p: p[2], reverse=True)
-    
-    top_two = points[:2]
-    bottom_two = points[2:]
-    
-    top_two.sort(key=lambda p: p[1])
-    mapping[top_two[0][0]] = 'Electronics' 
-    mapping[top_two[1][0]] = 'Groceries'   
-    
-    bottom_two.sort(key=lambda p: p[1])
-    mapping[bottom_two[0][0]] = 'Home'     
-    mapping[bottom_two[1][0]] = 'Beauty'   
-    
-    return mapping
-
-cluster_names = assign_zone_names_dynamically(kmeans)
-
-# --- 3. BATCH PROCESS ALL TRACKER FILES ---
-tracking_files = sorted(glob.glob('mosaic_history_*.csv'))
+def catalog_entry(zone_name):
+    """Every zone sells something: names outside the catalog get generic products of their own."""
+    if zone_name in zones_catalog:
+        return zones_catalog[zone_name]
+    return {'products': [f'{zone_name} Essentials', f'{zone_name} Special', f'{zone_name} Bundle'],
+            'price': GENERIC_PRICE}
 
-if not tracking_files:
-    print("❌ Error: No 'mosaic_history_*.csv' files found in the directory.")
-    exit()
+# --- 2. PER-DAY SALES SIMULATION ---
+def generate_sales_for_day(day_index, input_file, model):
+    # Fresh entropy per day: forked pool workers would otherwise share one random state
+    random.seed()
 
-print(f"📁 Found {len(tracking_files)} tracking files. Starting Batch Processing...")
-
-for day_index, input_file in enumerate(tracking_files):
     file_id = input_file.replace('mosaic_history_', '').replace('.csv', '')
     output_file = f'sales_{file_id}.csv'
     current_day_start = BASE_SIMULATION_DATE + timedelta(days=day_index)
     
     try:
-        df = pd.read_csv(input_file)
+        df = read_tracking(input_file)
     except Exception as e:
         print(f"❌ Error reading '{input_file}': {e}")
-        continue
+        return None
 
     unique_visitors = df['person_id'].unique()
     
@@ -90,15 +67,13 @@ for day_index, input_file in enumerate(tracking_files):
         exit_time_secs = last_seen['time']
         
         # USE THE AI MODEL TO PREDICT THE ZONE
-        # Create a tiny dataframe with feature names matching the trained model
-        coord_df = pd.DataFrame({'x': [final_x], 'y': [final_y]})
-        cluster_id = kmeans.predict(coord_df)[0]
-        zone_name = cluster_names.get(cluster_id, 'Beauty') # Fallback just in case
+        zone_name = model.zone_of(final_x, final_y)
+        catalog = catalog_entry(zone_name)
         
         sale_time = current_day_start + timedelta(seconds=float(exit_time_secs))
         
-        product = random.choice(zones_catalog[zone_name]['products'])
-        price = random.randint(zones_catalog[zone_name]['price'][0], zones_catalog[zone_name]['price'][1])
+        product = random.choice(catalog['products'])
+        price = random.randint(catalog['price'][0], catalog['price'][1])
         
         sales_data.append({
             "Transaction_ID": f"TXN-{random.randint(10000, 99999)}",
@@ -116,5 +91,29 @@ for day_index, input_file in enumerate(tracking_files):
     sales_df = pd.DataFrame(sales_data)
     sales_df.to_csv(output_file, index=False)
     print(f"   ✅ Saved {len(sales_df)} transactions to '{output_file}'.")
+    return output_file
+
+# --- 3. BATCH PROCESS ALL TRACKER FILES ---
+def generate_all_sales():
+    try:
+        model = load_zone_model()
+    except FileNotFoundError:
+        print(f"❌ Error: '{MODEL_FILE}' not found. Please run zoning_engine.py first.")
+        return
+
+    tracking_files = sorted(glob.glob('mosaic_history_*.csv'))
+
+    if not tracking_files:
+        print("❌ Error: No 'mosaic_history_*.csv' files found in the directory.")
+        return
+
+    print(f"📁 Found {len(tracking_files)} tracking files. Starting Batch Processing...")
+
+    # Days are independent: simulate them side by side, one worker per core
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        list(pool.map(generate_sales_for_day, range(len(tracking_files)), tracking_files, repeat(model)))
+
+    print("\n🎉 All tracking data has been successfully correlated using the AI Zoning Model!")
 
-print("\n🎉 All tracking data has been successfully correlated using the AI Zoning Model!")
\ No newline at end of file
+if __name__ == "__main__":
+    generate_all_sales()
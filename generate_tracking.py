@@ -0,0 +1,167 @@
+import os
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from clean_atc_data import RESTRICTED_ZONES, X_MIN, Y_MIN
+
+# --- 1. CONFIGURATION ---
+BASE_SIMULATION_DATE = datetime(2026, 1, 20)   # Day files are named mosaic_history_MMDD.csv from here
+STORE_SIZE = 15000                 # Normalised store is 15m x 15m (millimetres)
+ENTRANCE = (7500, 600)             # Shoppers walk in and out at the bottom-centre door (open floor)
+OPEN_SECONDS = 12 * 3600           # 09:00 - 21:00
+SAMPLE_INTERVAL = 1.0              # Seconds between UWB fixes for one tag
+WALK_SPEED = 1100                  # mm/s between zones
+DWELL_JITTER = 450                 # mm of browsing movement around a shelf
+CHUNK_SHOPPERS = 20000             # Shoppers generated (and written) per batch to bound memory
+
+# Zone anchors laid out so assign_zone_names_dynamically recovers the same names. They sit
+# in open floor between clean_atc_data.RESTRICTED_ZONES, so cleaning keeps the zone mix intact
+ZONE_ANCHORS = {
+    'Electronics': (6000, 12500),  # Top-Left: aisle between the drinks wall and home goods
+    'Groceries':   (12300, 10500), # Top-Right: right of the apparel racks
+    'Home':        (3000, 4300),   # Bottom-Left: between checkout and the promo rack
+    'Beauty':      (12000, 5800),  # Bottom-Right: right of the grocery shelf rows
+}
+ZONE_POPULARITY = [0.18, 0.34, 0.22, 0.26]
+STOP_SPREAD = 700                  # mm; where along a zone's shelves a shopper stops
+STOP_RETRIES = 20                  # Redraws for a stop that lands inside a shelf or wall
+
+
+def in_restricted(x, y):
+    """Mask of points inside any of the shelves/walls clean_atc_data removes."""
+    mask = np.zeros(np.shape(x), dtype=bool)
+    for x_min, x_max, y_min, y_max in RESTRICTED_ZONES:
+        mask |= (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+    return mask
+
+
+# --- 2. ONE SHOPPER'S PATH ---
+def shopper_path(rng, n_points):
+    """
+    Entrance -> 1-4 zones (walk, then browse), sampled at n_points fixes. The track ends
+    at the last stop, where the shopper checks out: generate_sales puts each sale in the
+    zone of a shopper's last fix, so ending at the door would credit every sale to the
+    zone nearest the entrance.
+    """
+    anchors = np.array(list(ZONE_ANCHORS.values()), dtype=np.float64)
+    n_visits = rng.integers(1, 5)
+    visits = rng.choice(len(anchors), size=n_visits, replace=False, p=ZONE_POPULARITY)
+    stops = anchors[visits] + rng.normal(0, STOP_SPREAD, size=(n_visits, 2))
+    for _ in range(STOP_RETRIES):
+        blocked = in_restricted(stops[:, 0], stops[:, 1])
+        if not blocked.any():
+            break
+        stops[blocked] = anchors[visits[blocked]] + rng.normal(0, STOP_SPREAD, size=(blocked.sum(), 2))
+
+    waypoints = np.vstack([ENTRANCE, stops])
+    walk_time = np.linalg.norm(np.diff(waypoints, axis=0), axis=1) / WALK_SPEED
+    dwell_time = rng.gamma(2.0, 90.0, size=n_visits)
+
+    # Alternate walk and dwell segments: walk to stop 1, dwell, walk to stop 2, ..., dwell at the last
+    seg_time = np.empty(2 * n_visits)
+    seg_time[0::2] = walk_time
+    seg_time[1::2] = dwell_time
+    seg_start = np.concatenate(([0.0], np.cumsum(seg_time)))
+    seg_pos = np.repeat(waypoints, 2, axis=0)[1:]   # Both ends of each dwell are the same stop
+
+    # Stretch or squeeze the schedule so exactly n_points fixes cover the visit
+    t = np.linspace(0.0, seg_start[-1], n_points)
+    x = np.interp(t, seg_start, seg_pos[:, 0])
+    y = np.interp(t, seg_start, seg_pos[:, 1])
+
+    # Browsing noise only while dwelling
+    seg_index = np.searchsorted(seg_start, t, side='right') - 1
+    dwelling = (seg_index % 2) == 1
+    x[dwelling] += rng.normal(0, DWELL_JITTER, dwelling.sum())
+    y[dwelling] += rng.normal(0, DWELL_JITTER, dwelling.sum())
+    return x, y
+
+
+def generate_chunk(rng, first_pid, rows_per_shopper, arrivals):
+    n = len(arrivals)
+    pids = np.repeat(np.arange(first_pid, first_pid + n), rows_per_shopper)
+    offsets = np.tile(np.arange(rows_per_shopper) * SAMPLE_INTERVAL, n)
+    times = (np.repeat(arrivals, rows_per_shopper) + offsets).astype(np.int64)
+
+    xs = np.empty(n * rows_per_shopper)
+    ys = np.empty(n * rows_per_shopper)
+    for i in range(n):
+        sl = slice(i * rows_per_shopper, (i + 1) * rows_per_shopper)
+        xs[sl], ys[sl] = shopper_path(rng, rows_per_shopper)
+
+    np.clip(xs, 0, STORE_SIZE, out=xs)
+    np.clip(ys, 0, STORE_SIZE, out=ys)
+    xs = xs.round()
+    ys = ys.round()
+
+    step = np.hypot(np.diff(xs, prepend=xs[0]), np.diff(ys, prepend=ys[0])) / SAMPLE_INTERVAL
+    step[::rows_per_shopper] = 0.0   # First fix of every shopper has no previous point
+    return pd.DataFrame({'time': times, 'person_id': pids, 'x': xs, 'y': ys, 'velocity': step.round(1)})
+
+
+# --- 3. ONE DAY FILE ---
+def generate_day(output_file, n_rows, n_shoppers, seed=0, fmt='mosaic', first_pid=9000000):
+    """
+    Writes one day of tracking in mosaic_history_*.csv layout (fmt='mosaic') or as a raw
+    headerless ATC export for clean_atc_data (fmt='atc'). Rows are grouped by shopper in
+    arrival order, so every shopper's fixes are chronological.
+    """
+    rng = np.random.default_rng(seed)
+    rows_per_shopper = max(n_rows // n_shoppers, 2)
+    max_visit = rows_per_shopper * SAMPLE_INTERVAL
+    arrivals = np.sort(rng.uniform(0, max(OPEN_SECONDS - max_visit, 1), n_shoppers))
+
+    written = 0
+    with open(output_file, 'w', newline='') as f:
+        for start in range(0, n_shoppers, CHUNK_SHOPPERS):
+            chunk = generate_chunk(rng, first_pid + start, rows_per_shopper,
+                                   arrivals[start:start + CHUNK_SHOPPERS])
+            if fmt == 'atc':
+                # Raw ATC: epoch milliseconds, un-normalised coordinates, extra sensor columns
+                raw = pd.DataFrame({
+                    'time': chunk['time'] * 1000 + 1353798000000,
+                    'person_id': chunk['person_id'],
+                    'x': chunk['x'] + X_MIN, 'y': chunk['y'] + Y_MIN,
+                    'z': 1600.0, 'velocity': chunk['velocity'], 'angle': 0.0, 'facing': 0.0
+                })
+                raw.to_csv(f, header=False, index=False)
+            else:
+                chunk.to_csv(f, header=(start == 0), index=False)
+            written += len(chunk)
+    return written
+
+
+def generate_dataset(total_rows, n_shoppers, n_days, out_dir='.', fmt='mosaic', seed=42):
+    """Spreads total_rows and n_shoppers evenly over n_days files. Returns the file list."""
+    os.makedirs(out_dir, exist_ok=True)
+    files = []
+    for day in range(n_days):
+        file_id = (BASE_SIMULATION_DATE + timedelta(days=day)).strftime('%m%d')
+        name = f'atc-synthetic-{file_id}.csv' if fmt == 'atc' else f'mosaic_history_{file_id}.csv'
+        path = os.path.join(out_dir, name)
+        rows = generate_day(path, total_rows // n_days, max(n_shoppers // n_days, 1),
+                            seed=seed + day, fmt=fmt, first_pid=9000000 + day * n_shoppers)
+        print(f"   -> Wrote {rows:,} fixes to {path}")
+        files.append(path)
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic UWB tracking data at configurable scale.")
+    parser.add_argument('--rows', type=float, default=1e6, help="Total fixes across all days (e.g. 1e6, 1e8)")
+    parser.add_argument('--shoppers', type=int, default=None, help="Total shoppers (default: one per 600 fixes)")
+    parser.add_argument('--days', type=int, default=6)
+    parser.add_argument('--out', default='.', help="Output directory")
+    parser.add_argument('--format', choices=['mosaic', 'atc'], default='mosaic')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    total_rows = int(args.rows)
+    shoppers = args.shoppers or max(total_rows // 600, args.days)
+
+    print(f"🧪 Generating {total_rows:,} fixes for {shoppers:,} shoppers over {args.days} days...")
+    generate_dataset(total_rows, shoppers, args.days, out_dir=args.out, fmt=args.format, seed=args.seed)
+    print("✅ Synthetic tracking data ready.")
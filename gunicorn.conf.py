@@ -0,0 +1,22 @@
+import gc
+import os
+
+# --- CONFIGURATION ---
+# Picked up automatically by `gunicorn app:app` when started from the data directory.
+bind = os.getenv('MOSAIC_BIND', '127.0.0.1:8000')
+workers = int(os.getenv('MOSAIC_WEB_WORKERS', os.cpu_count() or 1))
+max_requests = int(os.getenv('MOSAIC_MAX_REQUESTS', '0'))   # Worker recycling; 0 = never
+max_requests_jitter = max_requests // 10
+
+# Import app.py once in the master so recycled workers fork warm instead of re-importing
+preload_app = os.getenv('MOSAIC_PRELOAD', '1') != '0'
+
+
+def on_starting(server):
+    if not server.cfg.preload_app:
+        return
+    import app
+    app.preload_shared_data()
+    # Move everything loaded so far out of the collector's reach: a GC pass in a worker
+    # would otherwise write to every object header and un-share the inherited pages
+    gc.freeze()
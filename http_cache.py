@@ -0,0 +1,125 @@
+import os
+import re
+import glob
+import gzip
+import hashlib
+from datetime import datetime, timezone
+
+from flask import request
+from werkzeug.http import is_resource_modified
+
+try:
+    import brotli   # Optional; gzip is used when it is not installed
+except ImportError:
+    brotli = None
+
+# --- CONFIGURATION ---
+# Past days still change whenever the pipeline re-runs (a new tracking day retrains the model and
+# regenerates every day's sales), so this is only sent for URLs that pin the data version they
+# were built from (?v=...): new data means new URLs, and unversioned URLs always revalidate.
+HISTORICAL_MAX_AGE = 7 * 24 * 3600
+VERSION_ARG = 'v'
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'text/javascript')
+MIN_COMPRESS_BYTES = 512             # Below this the encoding overhead outweighs the saving
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5                   # Good ratio while staying cheap enough to run per response
+HEATMAP_FILE = re.compile(r'^heatmap_(\d{4}-\d{2}-\d{2})\.png$')
+
+
+# --- VALIDATORS ---
+def data_version(*paths):
+    """ETag and Last-Modified for a response computed from these files (stat only, nothing is read)."""
+    parts, newest = [], None
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            parts.append(f'{path}:missing')
+            continue
+        parts.append(f'{path}:{st.st_mtime_ns}:{st.st_size}')
+        newest = max(newest or 0, st.st_mtime)
+    etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()[:20]
+    last_modified = datetime.fromtimestamp(int(newest), timezone.utc) if newest else None
+    return etag, last_modified
+
+
+def heatmap_version(static_folder):
+    """One version for all heatmaps of a store; the pipeline regenerates them together."""
+    folder = os.path.abspath(static_folder)   # Same token however the caller spells the folder
+    return data_version(*sorted(glob.glob(os.path.join(folder, 'heatmap_*.png'))))[0]
+
+
+def versioned_max_age(version, final=True):
+    """HISTORICAL_MAX_AGE when the content is final and the URL pins the current version, else None."""
+    return HISTORICAL_MAX_AGE if final and request.args.get(VERSION_ARG) == version else None
+
+
+def not_modified(etag, last_modified=None):
+    """True when the client's If-None-Match / If-Modified-Since already matches this version."""
+    return not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified=None, max_age=None):
+    """
+    Weak ETag (the body may be re-encoded below) plus Last-Modified. With max_age the
+    client may reuse the response without asking; without it, it must revalidate first.
+    """
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    if max_age:
+        response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+# --- RESPONSE HOOKS ---
+def _latest_heatmap_date(static_folder):
+    dates = [m.group(1) for m in (HEATMAP_FILE.match(os.path.basename(p))
+                                  for p in glob.glob(os.path.join(static_folder, 'heatmap_*.png'))) if m]
+    return max(dates) if dates else None
+
+
+def cache_heatmap(response, filename, static_folder):
+    """
+    Past days' heatmaps requested at the current version can be kept; the newest day and
+    unversioned or outdated URLs keep revalidating.
+    """
+    match = HEATMAP_FILE.match(os.path.basename(filename or ''))
+    if not match or response.status_code not in (200, 304):
+        return response
+    latest = _latest_heatmap_date(static_folder)
+    max_age = versioned_max_age(heatmap_version(static_folder), final=bool(latest and match.group(1) < latest))
+    response.headers['Cache-Control'] = f'public, max-age={max_age}' if max_age else 'no-cache'
+    return response
+
+
+def _compress(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_BYTES:
+        return
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        data, encoding = brotli.compress(data, quality=BROTLI_QUALITY), 'br'
+    elif accepted['gzip']:
+        data, encoding = gzip.compress(data, compresslevel=GZIP_LEVEL), 'gzip'
+    else:
+        return
+    response.set_data(data)   # Also updates Content-Length
+    response.headers['Content-Encoding'] = encoding
+
+
+def enable_http_caching(app):
+    """Long-lived caching for historical heatmaps and gzip/brotli for text responses."""
+    @app.after_request
+    def _cache_and_compress(response):
+        if request.endpoint == 'static':
+            cache_heatmap(response, (request.view_args or {}).get('filename'), app.static_folder)
+        else:
+            _compress(response)
+        return response
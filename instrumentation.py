@@ -0,0 +1,328 @@
+import os
+import sys
+import copy
+import json
+import time
+import threading
+import functools
+
+try:
+    import resource   # Unix only; peak RSS is simply not reported on Windows
+except ImportError:
+    resource = None
+
+try:
+    import fcntl      # Unix only; elsewhere the stage log is written without a file lock
+except ImportError:
+    fcntl = None
+
+# --- CONFIGURATION ---
+STAGE_LOG = 'stage_metrics.jsonl'             # One line per instrumented stage call, shared by all processes
+STAGE_LOG_MAX_BYTES = int(os.getenv('MOSAIC_STAGE_LOG_MB', '8')) * 1024 * 1024   # Compacted into per-stage totals past this
+PROFILE_DIR = 'profiles'
+PROFILER = os.getenv('MOSAIC_PROFILE', '').lower()   # '', 'cprofile' or 'pyinstrument'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+def peak_rss_bytes(who=None):
+    """High-water mark of this process's resident memory (or of its largest finished child)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def children_peak_rss_bytes():
+    """Largest RSS of any finished child, e.g. the process-pool workers that do a stage's real work."""
+    return peak_rss_bytes(resource.RUSAGE_CHILDREN) if resource is not None else None
+
+
+def record_rows(n):
+    """Adds to the row count of the innermost stage running on this thread."""
+    stack = getattr(_local, 'stages', None)
+    if stack:
+        stack[-1]['rows'] += int(n)
+
+
+# --- PROFILING (OPT-IN) ---
+def _start_profiler():
+    if PROFILER == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return 'pyinstrument', profiler
+        except ImportError:
+            print("⚠️ pyinstrument is not installed, falling back to cProfile.")
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return 'cprofile', profiler
+
+
+def _dump_profile(stage, kind, profiler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{stage}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+    if kind == 'pyinstrument':
+        profiler.stop()
+        with open(base + '.html', 'w') as f:
+            f.write(profiler.output_html())
+        return base + '.html'
+    profiler.disable()
+    profiler.dump_stats(base + '.prof')
+    return base + '.prof'
+
+
+# --- STAGE INSTRUMENTATION ---
+def instrument_stage(stage):
+    """
+    Decorator recording wall time, rows processed (via record_rows) and peak RSS for each call.
+    Records are appended to STAGE_LOG so calls made in pool workers and batch scripts
+    show up in the web app's /metrics. Set MOSAIC_PROFILE to also dump a profile per call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = getattr(_local, 'stages', None)
+            if stack is None:
+                stack = _local.stages = []
+            frame = {'rows': 0}
+            stack.append(frame)
+
+            profiler = _start_profiler() if PROFILER else None
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                if profiler:
+                    path = _dump_profile(stage, *profiler)
+                    print(f"   🔬 Profile for {stage} saved to {path}")
+                _append_stage_record({
+                    'stage': stage,
+                    'seconds': round(elapsed, 6),
+                    'rows': frame['rows'],
+                    'peak_rss_bytes': peak_rss_bytes(),
+                    'children_peak_rss_bytes': children_peak_rss_bytes(),
+                    'pid': os.getpid(),
+                    'ts': time.time()
+                })
+        return wrapper
+    return decorator
+
+
+def _lock_file(f, exclusive):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)   # Released on close
+
+
+def _append_stage_record(record, path=STAGE_LOG):
+    line = json.dumps(record) + '\n'
+    with _log_lock:
+        try:
+            with open(path, 'a+') as f:
+                _lock_file(f, exclusive=True)
+                f.write(line)
+                f.flush()
+                if f.tell() > STAGE_LOG_MAX_BYTES:
+                    _compact(f)
+        except OSError as e:
+            print(f"⚠️ Could not record stage metrics: {e}")
+
+
+def _compact(f):
+    """Rewrites the locked log as one summary line per stage, so it stops growing."""
+    f.seek(0)
+    totals = {}
+    for line in f:
+        _fold(totals, line)
+    f.seek(0)
+    f.truncate()
+    now = time.time()
+    for stage, t in sorted(totals.items()):
+        f.write(json.dumps({'summary': True, 'stage': stage, 'buckets': t['hist'].buckets,
+                            'count': t['hist'].count, 'sum': t['hist'].sum, 'rows': t['rows'],
+                            'peak_rss_bytes': t['peak_rss'], 'children_peak_rss_bytes': t['children_peak_rss'],
+                            'ts': now}) + '\n')
+
+
+# --- PROMETHEUS RENDERING ---
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+    def merge(self, buckets, count, total):
+        """Adds a compacted histogram (see _compact)."""
+        self.buckets = [a + b for a, b in zip(self.buckets, buckets)]
+        self.count += count
+        self.sum += total
+
+
+def _labels(**labels):
+    return ','.join(f'{k}="{v}"' for k, v in labels.items())
+
+
+def _render_histogram(lines, name, help_text, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, hist in sorted(series.items()):
+        label_str = _labels(**dict(labels))
+        # Prometheus buckets are cumulative
+        for bound, count in zip(BUCKETS, hist.buckets):
+            lines.append(f'{name}_bucket{{{label_str},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{label_str},le="+Inf"}} {hist.count}')
+        lines.append(f'{name}_sum{{{label_str}}} {hist.sum:.6f}')
+        lines.append(f'{name}_count{{{label_str}}} {hist.count}')
+
+
+def _fold(totals, line):
+    """Adds one log line (a stage call, or a summary left by _compact) to per-stage totals."""
+    try:
+        rec = json.loads(line)
+        stage = rec['stage']
+    except (ValueError, KeyError, TypeError):
+        return
+    t = totals.setdefault(stage, {'hist': Histogram(), 'rows': 0, 'peak_rss': 0, 'children_peak_rss': 0})
+    if rec.get('summary'):
+        t['hist'].merge(rec['buckets'], rec['count'], rec['sum'])
+    else:
+        t['hist'].observe(rec['seconds'])
+    t['rows'] += rec.get('rows', 0)
+    t['peak_rss'] = max(t['peak_rss'], rec.get('peak_rss_bytes') or 0)
+    t['children_peak_rss'] = max(t['children_peak_rss'], rec.get('children_peak_rss_bytes') or 0)
+
+
+class StageLogReader:
+    """Running totals of one stage log; each scrape only parses the lines appended since the last."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, head):
+        self.head = head      # First line, which changes when the log is compacted
+        self.offset = 0
+        self.totals = {}
+
+    def totals_now(self):
+        with self.lock:
+            if not os.path.exists(self.path):
+                self._reset(None)
+                return {}
+            with open(self.path, 'rb') as f:
+                _lock_file(f, exclusive=False)
+                head = f.readline()
+                if head != self.head or os.fstat(f.fileno()).st_size < self.offset:
+                    self._reset(head)
+                f.seek(self.offset)
+                data = f.read()
+            end = data.rfind(b'\n') + 1   # A line still being written is picked up next time
+            for line in data[:end].splitlines():
+                _fold(self.totals, line)
+            self.offset += end
+            return copy.deepcopy(self.totals)   # Rendered outside the lock
+
+
+_readers = {}
+
+
+def render_stage_metrics(logs=None):
+    """
+    logs: store id -> stage log path (default: this directory's log, unlabelled). Series of
+    any other store carry a store label.
+    """
+    durations, rows, peak_rss, children_peak_rss = {}, {}, {}, {}
+    for store, path in (logs or {None: STAGE_LOG}).items():
+        reader = _readers.setdefault(path, StageLogReader(path))
+        for stage, t in reader.totals_now().items():
+            key = (('stage', stage),) + ((('store', store),) if store else ())
+            durations[key] = t['hist']
+            rows[key] = t['rows']
+            if t['peak_rss']:
+                peak_rss[key] = t['peak_rss']
+            if t['children_peak_rss']:
+                children_peak_rss[key] = t['children_peak_rss']
+
+    lines = []
+    _render_histogram(lines, 'mosaic_stage_duration_seconds', 'Wall time per instrumented stage call.', durations)
+    lines.append("# HELP mosaic_stage_rows_total Rows processed by instrumented stages.")
+    lines.append("# TYPE mosaic_stage_rows_total counter")
+    for key, value in sorted(rows.items()):
+        lines.append(f'mosaic_stage_rows_total{{{_labels(**dict(key))}}} {value}')
+    lines.append("# HELP mosaic_stage_peak_rss_bytes Highest process RSS observed at the end of a stage call.")
+    lines.append("# TYPE mosaic_stage_peak_rss_bytes gauge")
+    for key, value in sorted(peak_rss.items()):
+        lines.append(f'mosaic_stage_peak_rss_bytes{{{_labels(**dict(key))}}} {value}')
+    lines.append("# HELP mosaic_stage_children_peak_rss_bytes Highest RSS of a finished pool worker (or other child) "
+                 "of the process running the stage.")
+    lines.append("# TYPE mosaic_stage_children_peak_rss_bytes gauge")
+    for key, value in sorted(children_peak_rss.items()):
+        lines.append(f'mosaic_stage_children_peak_rss_bytes{{{_labels(**dict(key))}}} {value}')
+    return lines
+
+
+# --- FLASK ROUTE INSTRUMENTATION ---
+class RequestMetrics:
+    """In-process per-route latency histograms and request counters for the web app."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = {}
+
+    def observe(self, route, method, status, seconds):
+        key = (('route', route), ('method', method), ('status', str(status)))
+        with self.lock:
+            self.durations.setdefault(key, Histogram()).observe(seconds)
+
+    def render(self):
+        with self.lock:
+            series = dict(self.durations)
+            lines = []
+            _render_histogram(lines, 'mosaic_http_request_duration_seconds',
+                              'Flask request latency by route.', series)
+            lines.append("# HELP mosaic_http_requests_total Flask requests served by route.")
+            lines.append("# TYPE mosaic_http_requests_total counter")
+            for key, hist in sorted(series.items()):
+                lines.append(f'mosaic_http_requests_total{{{_labels(**dict(key))}}} {hist.count}')
+        rss = peak_rss_bytes()
+        if rss is not None:
+            lines.append("# HELP mosaic_process_peak_rss_bytes Peak RSS of this web worker.")
+            lines.append("# TYPE mosaic_process_peak_rss_bytes gauge")
+            lines.append(f"mosaic_process_peak_rss_bytes {rss}")
+        return lines
+
+
+def instrument_flask(app):
+    """Times every request; routes are labelled by URL rule so /api/dashboard/<date> stays one series."""
+    from flask import g, request
+
+    metrics = RequestMetrics()
+
+    @app.before_request
+    def _start_timer():
+        g._mosaic_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, '_mosaic_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.observe(route, request.method, response.status_code, time.perf_counter() - start)
+        return response
+
+    return metrics
@@ -1,10 +1,11 @@
 import os
 import json
-import pandas as pd
 import uuid
 from datetime import datetime
 from dotenv import load_dotenv
-from groq import Groq
+
+from instrumentation import instrument_stage, record_rows
+from schemas import read_kpi
 
 # --- CONFIGURATION ---
 load_dotenv()
@@ -45,15 +46,17 @@ def generate_offline_strategies(df):
         insights.append(entry)
     return insights
 
-def generate_insights():
+@instrument_stage('insights')
+def generate_insights(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
     print("🔮 SPECTRE INTELLIGENCE: Initializing Llama 3.3 (Groq)...")
 
-    if not API_KEY or not os.path.exists(INPUT_FILE):
-        print("❌ Configuration Error: Missing API Key or zone_analytics.csv")
+    if not API_KEY or not os.path.exists(input_file):
+        print(f"❌ Configuration Error: Missing API Key or {input_file}")
         return
     
-    df = pd.read_csv(INPUT_FILE)
+    df = read_kpi(input_file)
     if df.empty: return
+    record_rows(len(df))
 
     # --- 1. COMPILE STRICT DATA CONTEXT ---
     batch_data_str = ""
@@ -103,6 +106,7 @@ def generate_insights():
 
     # --- 3. CALL GROQ API ---
     try:
+        from groq import Groq   # Only needed when the API is actually called
         client = Groq(api_key=API_KEY)
         print("   ...Transmitting Data to Neural Engine...")
         
@@ -143,14 +147,14 @@ def generate_insights():
                 }
                 current_insights.append(entry)
         
-        with open(OUTPUT_FILE, 'w') as f:
+        with open(output_file, 'w') as f:
             json.dump(current_insights, f, indent=4)
-        print(f"   ✅ Llama 3 Analysis Successful! Saved to {OUTPUT_FILE}")
+        print(f"   ✅ Llama 3 Analysis Successful! Saved to {output_file}")
 
     except Exception as e:
         print(f"   ⚠️ Groq API Failed: {e}")
         current_insights = generate_offline_strategies(df)
-        with open(OUTPUT_FILE, 'w') as f:
+        with open(output_file, 'w') as f:
             json.dump(current_insights, f, indent=4)
 
 if __name__ == "__main__":
@@ -1,57 +1,96 @@
 import pandas as pd
-import pickle
 import os
 import glob
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from comparisons import build_deltas, build_prefix
+from instrumentation import instrument_stage, record_rows
+from schemas import KPI, conform, read_sales, read_tracking
+from zone_model import MODEL_FILE, load_zone_model
 
 # --- 1. CONFIGURATION ---
-MODEL_FILE = 'zone_model.pkl'
 HISTORICAL_OUTPUT = 'historical_analytics.csv' 
 LIVE_OUTPUT = 'zone_analytics.csv'             
+DELTAS_OUTPUT = 'kpi_deltas.csv'        # Day-over-day / week-over-week deltas per zone
+PREFIX_OUTPUT = 'kpi_prefix.csv'        # Running sums per zone, for arbitrary date ranges
+MAX_WORKERS = int(os.getenv('MOSAIC_WORKERS', os.cpu_count() or 1))
+
+# --- PER-DAY METRICS ---
+@instrument_stage('kpi_day')
+def process_day(tracking_file, model):
+    file_id = tracking_file.replace('mosaic_history_', '').replace('.csv', '')
+    sales_file = f'sales_{file_id}.csv'
+    
+    if not os.path.exists(sales_file):
+        print(f"   ⚠️ Warning: Missing {sales_file}. Skipping {tracking_file}...")
+        return None
+        
+    print(f"   -> Merging {tracking_file} with {sales_file}")
+    
+    # A. Process Tracking
+    df_track = read_tracking(tracking_file, usecols=['person_id', 'x', 'y', 'time'])
+    record_rows(len(df_track))
+    df_track['Zone_Name'] = pd.Categorical.from_codes(model.predict(df_track['x'].to_numpy(), df_track['y'].to_numpy()),
+                                                      categories=model.labels)
+    df_track = df_track.dropna(subset=['Zone_Name'])
+
+    # Calculate dwell time PER PERSON first
+    person_dwell = df_track.groupby(['Zone_Name', 'person_id'], observed=True)['time'].agg(lambda x: x.max() - x.min()).reset_index()
+    
+    # Then aggregate by zone to get average dwell time and total visitors
+    zone_stats = person_dwell.groupby('Zone_Name', observed=True).agg(
+        Visitors=('person_id', 'count'),
+        Avg_Dwell_Time=('time', 'mean') 
+    ).reset_index()
+
+    # B. Process Sales
+    df_sales = read_sales(sales_file)
+    current_date = df_sales['Date'].iloc[0] 
+    df_sales['Zone'] = df_sales['Zone'].astype(object)
+    if 'Fashion' not in model.labels:
+        # Legacy sales feeds still say Fashion for the aisle the zone layout calls Groceries
+        df_sales['Zone'] = df_sales['Zone'].replace('Fashion', 'Groceries')
 
-# --- SMART ZONING LOGIC (BULLETPROOF FIX) ---
-def assign_zone_names_dynamically(kmeans_model):
-    centers = kmeans_model.cluster_centers_
-    mapping = {}
+    sales_stats = df_sales.groupby('Zone').agg(
+        Transactions=('Transaction_ID', 'nunique'),
+        Revenue=('Amount', 'sum')
+    ).reset_index()
 
-    # Create a list of (cluster_id, x, y)
-    points = [(i, c[0], c[1]) for i, c in enumerate(centers)]
+    # C. Merge and Calculate
+    zone_stats['Zone_Name'] = zone_stats['Zone_Name'].astype(object)
+    daily_df = pd.merge(zone_stats, sales_stats, left_on='Zone_Name', right_on='Zone', how='left')
+    daily_df = daily_df.fillna(0)
     
-    # Sort all 4 centers by Y-coordinate (Highest to Lowest)
-    points.sort(key=lambda p: p[2], reverse=True)
+    daily_df['Conversion_Rate'] = np.where(
+        daily_df['Visitors'] > 0, 
+        (daily_df['Transactions'] / daily_df['Visitors']) * 100, 
+        0
+    )
     
-    # Strictly split into Top 2 and Bottom 2 (No more relying on the mean!)
-    top_two = points[:2]
-    bottom_two = points[2:]
+    daily_df['Conversion_Rate'] = daily_df['Conversion_Rate'].round(2)
+    daily_df['Avg_Dwell_Time'] = daily_df['Avg_Dwell_Time'].round(1)
+    daily_df['Revenue'] = daily_df['Revenue'].round()
     
-    # Sort Top Two by X (Left to Right)
-    top_two.sort(key=lambda p: p[1])
-    mapping[top_two[0][0]] = 'Electronics' # Top-Left
-    mapping[top_two[1][0]] = 'Groceries'   # Top-Right
+    daily_df = daily_df[['Zone_Name', 'Visitors', 'Avg_Dwell_Time', 'Transactions', 'Conversion_Rate', 'Revenue']]
     
-    # Sort Bottom Two by X (Left to Right)
-    bottom_two.sort(key=lambda p: p[1])
-    mapping[bottom_two[0][0]] = 'Home'     # Bottom-Left
-    mapping[bottom_two[1][0]] = 'Beauty'   # Bottom-Right
-    
-    return mapping
+    # D. Time-Stamp the Data
+    daily_df.insert(0, 'Date', current_date)
+    return conform(daily_df, KPI, source=tracking_file)
 
 def run_kpi_engine():
     print("🧠 SPECTRE KPI ENGINE: Initializing Time-Series Compilation...")
 
-    if not os.path.exists(MODEL_FILE):
+    # --- 1. LOAD AI MODEL ---
+    try:
+        model = load_zone_model()
+    except FileNotFoundError:
         print(f"❌ Error: {MODEL_FILE} not found. Run zoning_engine.py first.")
         return
-
-    # --- 1. LOAD AI MODEL ---
-    with open(MODEL_FILE, 'rb') as f:
-        kmeans = pickle.load(f)
-    
-    cluster_names = assign_zone_names_dynamically(kmeans)
     
-    print("\n🔹 DYNAMIC ZONE MAPPING:")
-    for cluster_id, name in cluster_names.items():
-        center = kmeans.cluster_centers_[cluster_id]
+    print(f"\n🔹 DYNAMIC ZONE MAPPING (model {model.version}):")
+    for cluster_id, name in model.names.items():
         print(f"   - Cluster {cluster_id} assigned to -> {name}")
 
     # --- 2. FIND ALL TRACKING FILES ---
@@ -60,64 +99,13 @@ def run_kpi_engine():
         print("❌ Error: No tracking files found.")
         return
 
-    all_historical_data = []
-    
     print("\n⏳ Processing Daily Metrics...")
 
     # --- 3. BATCH PROCESS EACH DAY ---
-    for tracking_file in tracking_files:
-        file_id = tracking_file.replace('mosaic_history_', '').replace('.csv', '')
-        sales_file = f'sales_{file_id}.csv'
-        
-        if not os.path.exists(sales_file):
-            print(f"   ⚠️ Warning: Missing {sales_file}. Skipping {tracking_file}...")
-            continue
-            
-        print(f"   -> Merging {tracking_file} with {sales_file}")
-        
-        # A. Process Tracking
-        df_track = pd.read_csv(tracking_file, usecols=['person_id', 'x', 'y', 'time'])
-        df_track['cluster_id'] = kmeans.predict(df_track[['x', 'y']])
-        df_track['Zone_Name'] = df_track['cluster_id'].map(cluster_names)
-        df_track = df_track.dropna(subset=['Zone_Name'])
-
-        # Calculate dwell time PER PERSON first
-        person_dwell = df_track.groupby(['Zone_Name', 'person_id'])['time'].agg(lambda x: x.max() - x.min()).reset_index()
-        
-        # Then aggregate by zone to get average dwell time and total visitors
-        zone_stats = person_dwell.groupby('Zone_Name').agg(
-            Visitors=('person_id', 'count'),
-            Avg_Dwell_Time=('time', 'mean') 
-        ).reset_index()
-
-        # B. Process Sales
-        df_sales = pd.read_csv(sales_file)
-        current_date = df_sales['Date'].iloc[0] 
-        df_sales['Zone'] = df_sales['Zone'].replace('Fashion', 'Groceries')
-
-        sales_stats = df_sales.groupby('Zone').agg(
-            Transactions=('Transaction_ID', 'nunique'),
-            Revenue=('Amount', 'sum')
-        ).reset_index()
-
-        # C. Merge and Calculate
-        daily_df = pd.merge(zone_stats, sales_stats, left_on='Zone_Name', right_on='Zone', how='left')
-        daily_df = daily_df.fillna(0)
-        
-        daily_df['Conversion_Rate'] = np.where(
-            daily_df['Visitors'] > 0, 
-            (daily_df['Transactions'] / daily_df['Visitors']) * 100, 
-            0
-        )
-        
-        daily_df['Conversion_Rate'] = daily_df['Conversion_Rate'].round(2)
-        daily_df['Avg_Dwell_Time'] = daily_df['Avg_Dwell_Time'].round(1)
-        
-        daily_df = daily_df[['Zone_Name', 'Visitors', 'Avg_Dwell_Time', 'Transactions', 'Conversion_Rate', 'Revenue']]
-        
-        # D. Time-Stamp the Data
-        daily_df.insert(0, 'Date', current_date)
-        all_historical_data.append(daily_df)
+    # Days are independent, so they are compiled in parallel; map() keeps them in date order
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        daily_results = pool.map(process_day, tracking_files, repeat(model))
+        all_historical_data = [daily_df for daily_df in daily_results if daily_df is not None]
 
     # --- 4. COMPILE MASTER LOG & LIVE CACHE ---
     if not all_historical_data:
@@ -134,9 +122,16 @@ def run_kpi_engine():
     
     latest_date_str = all_historical_data[-1]['Date'].iloc[0]
 
+    # --- 5. PRECOMPUTE COMPARISONS ---
+    # The comparison API looks these up instead of re-aggregating the whole history per request
+    deltas_df = build_deltas(master_df)
+    deltas_df.to_csv(DELTAS_OUTPUT, index=False)
+    build_prefix(master_df).to_csv(PREFIX_OUTPUT, index=False)
+
     print(f"\n✅ KPI Compilation Complete!")
     print(f"💾 Master Database saved to: {HISTORICAL_OUTPUT} ({len(master_df)} rows total)")
     print(f"💾 Live Dashboard Cache saved to: {LIVE_OUTPUT} (Updated to {latest_date_str})")
+    print(f"💾 Comparisons saved to: {DELTAS_OUTPUT} ({len(deltas_df)} dod/wow rows) and {PREFIX_OUTPUT}")
 
 if __name__ == "__main__":
     run_kpi_engine()
\ No newline at end of file
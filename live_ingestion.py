@@ -0,0 +1,257 @@
+import os
+import json
+import math
+import time
+import socket
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from zone_model import MODEL_FILE, load_zone_model
+
+# --- CONFIGURATION ---
+UDP_HOST = os.getenv("MOSAIC_LIVE_HOST", "127.0.0.1")
+UDP_PORT = int(os.getenv("MOSAIC_LIVE_UDP_PORT", "9750"))     # Raw position fixes from the anchors (or the replay tool)
+HTTP_PORT = int(os.getenv("MOSAIC_LIVE_HTTP_PORT", "9751"))   # Batch ingest + live state for the dashboard
+
+OCCUPANCY_WINDOW = 900   # Ring buffer slots: one occupancy sample per second of tracking time
+DWELL_WINDOW = 2000      # Completed dwell samples kept per zone
+PERSON_TIMEOUT = 30      # Seconds of tracking time without a fix before a shopper has left the floor
+UDP_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+def coerce_fix(parts):
+    """(person_id, x, y, time) from four raw values. Raises ValueError/TypeError on anything else."""
+    if len(parts) != 4:
+        raise ValueError(f"expected 4 values, got {len(parts)}")
+    pid, x, y, t = int(parts[0]), float(parts[1]), float(parts[2]), float(parts[3])
+    if not (math.isfinite(x) and math.isfinite(y) and math.isfinite(t)):
+        raise ValueError("coordinates and time must be finite")
+    return pid, x, y, t
+
+
+def to_columns(fixes):
+    return tuple(list(col) for col in zip(*fixes)) if fixes else ([], [], [], [])
+
+
+def parse_fixes(payload):
+    """Parses 'person_id,x,y,time' lines into column arrays. Header and malformed lines are skipped."""
+    fixes = []
+    for line in payload.splitlines():
+        parts = line.split(b',') if isinstance(line, bytes) else line.split(',')
+        try:
+            fixes.append(coerce_fix(parts))
+        except (ValueError, TypeError):
+            continue
+    return to_columns(fixes)
+
+
+def parse_json_fixes(body):
+    """{"fixes": [[person_id, x, y, time], ...]} -> column arrays. Any bad row rejects the whole batch."""
+    rows = json.loads(body).get('fixes', [])
+    if not isinstance(rows, list):
+        raise TypeError("'fixes' must be a list of [person_id, x, y, time] rows")
+    return to_columns([coerce_fix(row) for row in rows])
+
+
+class LiveZoneState:
+    """Rolling per-zone occupancy and dwell, fed by position fixes as they arrive."""
+
+    def __init__(self, model):
+        self.model = model
+        self.zone_names = model.labels
+        n_zones = len(self.zone_names)
+
+        self.lock = threading.Lock()
+        self.person_zone = {}    # person_id -> zone index of the last fix
+        self.person_enter = {}   # person_id -> tracking time they entered that zone
+        self.person_last = {}    # person_id -> tracking time of the last fix
+
+        self.occupancy = [0] * n_zones
+        self.visits = [0] * n_zones
+        self.occupancy_history = deque(maxlen=OCCUPANCY_WINDOW)
+        self.dwell_samples = [deque(maxlen=DWELL_WINDOW) for _ in range(n_zones)]
+
+        self.clock = None          # Latest tracking time seen
+        self.last_tick = None      # Tracking second of the last ring buffer sample
+        self.fixes_total = 0
+        self.last_fix_wall = None  # Wall-clock time the last batch was applied
+
+    @classmethod
+    def from_model(cls, model_file=MODEL_FILE):
+        return cls(load_zone_model(model_file))
+
+    def ingest(self, pids, xs, ys, ts):
+        if not pids:
+            return 0
+        # One vectorised nearest-center pass for the whole batch
+        zones = self.model.predict(np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)).tolist()
+
+        with self.lock:
+            person_zone = self.person_zone
+            person_enter = self.person_enter
+            person_last = self.person_last
+            occupancy = self.occupancy
+            clock = self.clock
+
+            for pid, zone, t in zip(pids, zones, ts):
+                if clock is not None and t < clock - PERSON_TIMEOUT:
+                    # Tracking time went back (the next day's file starts at 0 again)
+                    self._new_session()
+                    clock = None
+                prev = person_zone.get(pid)
+                if prev is None:
+                    occupancy[zone] += 1
+                    self.visits[zone] += 1
+                    person_enter[pid] = t
+                elif prev != zone:
+                    occupancy[prev] -= 1
+                    occupancy[zone] += 1
+                    self.visits[zone] += 1
+                    self.dwell_samples[prev].append(t - person_enter[pid])
+                    person_enter[pid] = t
+                person_zone[pid] = zone
+                person_last[pid] = t
+                if clock is None or t > clock:
+                    clock = t
+
+            self.clock = clock
+            self.fixes_total += len(pids)
+            self.last_fix_wall = time.time()
+            self._tick()
+        return len(pids)
+
+    def _new_session(self):
+        """Closes every open visit and restarts the clock; the dwell and visit totals are kept."""
+        for pid, zone in self.person_zone.items():
+            self.dwell_samples[zone].append(self.person_last[pid] - self.person_enter[pid])
+        self.person_zone.clear()     # Cleared in place: ingest() holds references to these
+        self.person_enter.clear()
+        self.person_last.clear()
+        self.occupancy[:] = [0] * len(self.occupancy)
+        self.occupancy_history.clear()   # Its time axis restarts with the session
+        self.clock = None
+        self.last_tick = None
+
+    def _tick(self):
+        """Advances the ring buffer once per tracking second and evicts shoppers who went quiet."""
+        second = int(self.clock)
+        if self.last_tick is not None and second <= self.last_tick:
+            return
+        self.last_tick = second
+
+        cutoff = self.clock - PERSON_TIMEOUT
+        gone = [pid for pid, last in self.person_last.items() if last < cutoff]
+        for pid in gone:
+            zone = self.person_zone.pop(pid)
+            self.occupancy[zone] -= 1
+            self.dwell_samples[zone].append(self.person_last.pop(pid) - self.person_enter.pop(pid))
+
+        self.occupancy_history.append((second, list(self.occupancy)))
+
+    def snapshot(self, history=120):
+        with self.lock:
+            zones = []
+            for i, name in enumerate(self.zone_names):
+                dwell = self.dwell_samples[i]
+                zones.append({
+                    'Zone_Name': name,
+                    'Occupancy': self.occupancy[i],
+                    'Visits': self.visits[i],
+                    'Avg_Dwell_Time': round(sum(dwell) / len(dwell), 1) if dwell else 0.0
+                })
+            recent = list(self.occupancy_history)[-history:]
+            return {
+                'status': 'live',
+                'model_version': self.model.version,
+                'tracking_time': self.clock,
+                'active_shoppers': len(self.person_zone),
+                'fixes_total': self.fixes_total,
+                'lag_seconds': round(time.time() - self.last_fix_wall, 3) if self.last_fix_wall else None,
+                'zones': zones,
+                'occupancy_history': {
+                    'time': [t for t, _ in recent],
+                    'zones': {name: [counts[i] for _, counts in recent] for i, name in enumerate(self.zone_names)}
+                }
+            }
+
+
+# --- UDP LISTENER ---
+def serve_udp(state, host=UDP_HOST, port=UDP_PORT):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_BUFFER_BYTES)
+    sock.bind((host, port))
+    print(f"📡 UDP listener on {host}:{port}")
+    while True:
+        payload, _ = sock.recvfrom(65535)
+        try:
+            state.ingest(*parse_fixes(payload))
+        except Exception as e:
+            # One bad datagram must not take the listener down with it
+            print(f"⚠️ Dropped UDP datagram: {e}")
+
+
+# --- HTTP BATCH ENDPOINT + LIVE STATE ---
+def make_http_handler(state):
+    class LiveHandler(BaseHTTPRequestHandler):
+        def _send_json(self, body, status=200):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.startswith('/state'):
+                self._send_json(state.snapshot())
+            else:
+                self._send_json({'error': 'not found'}, status=404)
+
+        def do_POST(self):
+            if not self.path.startswith('/ingest'):
+                self._send_json({'error': 'not found'}, status=404)
+                return
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                # JSON batches: {"fixes": [[person_id, x, y, time], ...]}
+                try:
+                    fixes = parse_json_fixes(body)
+                except (ValueError, AttributeError, TypeError) as e:
+                    self._send_json({'error': f'invalid JSON batch: {e}'}, status=400)
+                    return
+            else:
+                fixes = parse_fixes(body)
+            self._send_json({'accepted': state.ingest(*fixes)})
+
+        def log_message(self, format, *args):
+            pass  # Keep the console readable at thousands of requests per second
+
+    return LiveHandler
+
+
+def run_live_service():
+    print("🛰️  SPECTRE LIVE: Initializing Real-Time Zone Tracking...")
+
+    try:
+        state = LiveZoneState.from_model()
+    except FileNotFoundError:
+        print(f"❌ Error: {MODEL_FILE} not found. Run zoning_engine.py first.")
+        return
+
+    print(f"🔹 Zones: {', '.join(state.zone_names)}")
+
+    threading.Thread(target=serve_udp, args=(state,), daemon=True).start()
+
+    server = ThreadingHTTPServer((UDP_HOST, HTTP_PORT), make_http_handler(state))
+    print(f"🌐 HTTP ingest + state on http://{UDP_HOST}:{HTTP_PORT} (POST /ingest, GET /state)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Live service stopped.")
+
+
+if __name__ == "__main__":
+    run_live_service()
@@ -0,0 +1,312 @@
+import io
+import os
+import ast
+import sys
+import json
+import glob
+import time
+import hashlib
+import argparse
+import contextlib
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait, as_completed
+
+from clean_atc_data import INPUT_FILE as ATC_INPUT_FILE
+from stores import STORES_DIR, list_stores, store_dir
+from zone_model import MODEL_FILE, LAYOUT_FILE, read_model_version
+
+# --- CONFIGURATION ---
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = '.pipeline_state.json'   # Input hashes of the last successful run of each stage
+LOG_DIR = '.pipeline_logs'             # Captured stdout of each stage run
+MAX_PARALLEL_STAGES = 4
+MAX_WORKERS = int(os.getenv('MOSAIC_WORKERS', os.cpu_count() or 1))   # Also the number of stores run side by side
+
+
+class Stage:
+    """One pipeline step: a script plus the file patterns it reads and writes."""
+
+    def __init__(self, name, script, inputs, outputs, deps=(), optional=False):
+        self.name = name
+        self.script = script
+        self.inputs = inputs
+        self.outputs = outputs
+        self.deps = list(deps)
+        self.optional = optional   # Failure is reported but does not fail the pipeline
+
+
+# --- THE DAG ---
+# Per-day fan-out happens inside the sales, heatmap and KPI scripts (process pools).
+STAGES = [
+    Stage('clean', 'clean_atc_data.py',
+          inputs=[ATC_INPUT_FILE], outputs=['mosaic_history_*.csv']),
+    Stage('zoning', 'zoning_engine.py',
+          inputs=['mosaic_history_*.csv', LAYOUT_FILE], outputs=[MODEL_FILE], deps=['clean']),
+    Stage('sales', 'generate_sales.py',
+          inputs=[MODEL_FILE, 'mosaic_history_*.csv'], outputs=['sales_*.csv'], deps=['zoning']),
+    Stage('heatmaps', 'generate_heatmap.py',
+          inputs=[MODEL_FILE, 'mosaic_history_*.csv'], outputs=['static/heatmap_*.png'], deps=['zoning']),
+    Stage('kpi', 'kpi_engine.py',
+          inputs=[MODEL_FILE, 'mosaic_history_*.csv', 'sales_*.csv'],
+          outputs=['historical_analytics.csv', 'zone_analytics.csv', 'kpi_deltas.csv', 'kpi_prefix.csv'],
+          deps=['sales']),
+    Stage('intelligence', 'intelligence_engine.py',
+          inputs=['zone_analytics.csv'], outputs=['strategy_log.json'], deps=['kpi'], optional=True),
+]
+
+
+# --- HASHING ---
+def expand(patterns):
+    files = []
+    for pattern in patterns:
+        files.extend(sorted(glob.glob(pattern)))
+    return files
+
+
+def file_digest(path, hash_cache):
+    """Content hash, memoised on (size, mtime) so unchanged multi-GB tracking files are not re-read."""
+    if os.path.basename(path) == MODEL_FILE:
+        # A retrain that lands on the same centers keeps its version, so nothing downstream re-runs
+        return read_model_version(path)
+    st = os.stat(path)
+    key = f"{st.st_size}:{st.st_mtime_ns}"
+    cached = hash_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    hash_cache[path] = [key, digest]
+    return digest
+
+
+def code_files(script):
+    """The stage script plus every project module it imports, directly or not (lazy imports included)."""
+    seen, stack = [], [os.path.join(PROJECT_DIR, script)]
+    while stack:
+        path = stack.pop()
+        if path in seen:
+            continue
+        seen.append(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = os.path.join(PROJECT_DIR, name.split('.')[0] + '.py')
+                if os.path.exists(module):
+                    stack.append(module)
+    return sorted(seen)
+
+
+def stage_fingerprint(stage, hash_cache):
+    """Hash of the stage's code and every input file; None when the stage has no inputs at all."""
+    inputs = expand(stage.inputs)
+    if not inputs:
+        return None
+    h = hashlib.sha256()
+    for path in code_files(stage.script) + inputs:
+        h.update(os.path.basename(path).encode())
+        h.update(file_digest(path, hash_cache).encode())
+    return h.hexdigest()
+
+
+# --- ROW COUNTS ---
+def count_rows(path):
+    if path.endswith('.csv'):
+        with open(path, 'rb') as f:
+            lines = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b''))
+        return max(lines - 1, 0)
+    if path.endswith('.json'):
+        with open(path) as f:
+            data = json.load(f)
+        return len(data) if isinstance(data, list) else 1
+    return 1   # Images and model files count as one artifact each
+
+
+def output_report(stage):
+    files = expand(stage.outputs)
+    return len(files), sum(count_rows(f) for f in files)
+
+
+# --- ORCHESTRATOR ---
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {'stages': {}, 'hashes': {}}
+    with open(STATE_FILE) as f:
+        return json.load(f)
+
+
+def save_state(state):
+    with open(STATE_FILE, 'w') as f:
+        json.dump(state, f, indent=2)
+
+
+def run_stage(stage, log_dir):
+    log_path = os.path.join(log_dir, f'{stage.name}.log')
+    with open(log_path, 'w') as log:
+        proc = subprocess.run([sys.executable, os.path.join(PROJECT_DIR, stage.script)],
+                              stdout=log, stderr=subprocess.STDOUT)
+    return proc.returncode, log_path
+
+
+def run_pipeline(only=None, force=False):
+    print("🛰️  SPECTRE PIPELINE: Resolving stage graph...")
+
+    stages = {s.name: s for s in STAGES}
+    if only:
+        # Pull in everything the requested stages depend on
+        wanted, stack = set(), list(only)
+        while stack:
+            name = stack.pop()
+            if name not in wanted:
+                wanted.add(name)
+                stack.extend(stages[name].deps)
+        stages = {name: s for name, s in stages.items() if name in wanted}
+
+    state = load_state()
+    hash_cache = state.setdefault('hashes', {})
+    state_lock = threading.Lock()
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    results = {}
+    pending = dict(stages)
+    running = {}
+
+    def execute(stage):
+        with state_lock:
+            fingerprint = stage_fingerprint(stage, hash_cache)
+            previous = state['stages'].get(stage.name)
+        n_outputs = len(expand(stage.outputs))
+
+        if fingerprint is None:
+            status = 'skipped (no inputs)' if n_outputs else 'missing inputs'
+            return {'status': status, 'seconds': 0.0}
+        if not force and n_outputs and previous == fingerprint:
+            return {'status': 'fresh', 'seconds': 0.0}
+
+        print(f"   ▶️  {stage.name}: running {stage.script}")
+        start = time.perf_counter()
+        returncode, log_path = run_stage(stage, LOG_DIR)
+        elapsed = time.perf_counter() - start
+
+        if returncode != 0 or not expand(stage.outputs):
+            print(f"   ❌ {stage.name}: failed after {elapsed:.1f}s (see {log_path})")
+            return {'status': 'failed', 'seconds': elapsed}
+
+        with state_lock:
+            state['stages'][stage.name] = fingerprint
+        print(f"   ✅ {stage.name}: done in {elapsed:.1f}s")
+        return {'status': 'ran', 'seconds': elapsed}
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_STAGES) as pool:
+        while pending or running:
+            # Launch every stage whose dependencies have settled
+            for name, stage in list(pending.items()):
+                deps = [d for d in stage.deps if d in stages]
+                if any(d not in results for d in deps):
+                    continue
+                del pending[name]
+                if any(results[d]['status'] in ('failed', 'blocked', 'missing inputs') for d in deps):
+                    results[name] = {'status': 'blocked', 'seconds': 0.0}
+                    continue
+                running[pool.submit(execute, stage)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    save_state(state)
+
+    # --- REPORT ---
+    print(f"\n{'STAGE':<14}{'STATUS':<22}{'TIME':>9}{'FILES':>8}{'ROWS':>12}")
+    failed = False
+    for stage in STAGES:
+        if stage.name not in results:
+            continue
+        result = results[stage.name]
+        n_files, n_rows = output_report(stage)
+        print(f"{stage.name:<14}{result['status']:<22}{result['seconds']:>8.1f}s{n_files:>8}{n_rows:>12,}")
+        if result['status'] in ('failed', 'blocked') and not stage.optional:
+            failed = True
+
+    return not failed
+
+
+# --- MULTI-STORE ---
+def run_store(store_id, only, force, workers):
+    """One store's pipeline inside its own directory, with its report captured so stores never interleave."""
+    previous_dir = os.getcwd()
+    os.environ['MOSAIC_WORKERS'] = str(workers)   # Inherited by the stage subprocesses and their day pools
+    output = io.StringIO()
+    start = time.perf_counter()
+    try:
+        os.chdir(store_dir(store_id))
+        with contextlib.redirect_stdout(output):
+            ok = run_pipeline(only=only, force=force)
+    except Exception as e:
+        output.write(f"❌ Error: {e}\n")
+        ok = False
+    finally:
+        os.chdir(previous_dir)
+    return ok, time.perf_counter() - start, output.getvalue()
+
+
+def run_stores(store_ids, only=None, force=False):
+    # Split the cores between stores so the per-day pools inside each stage do not oversubscribe
+    parallel = max(1, min(MAX_WORKERS, len(store_ids)))
+    workers = max(1, (os.cpu_count() or 1) // parallel)
+    print(f"🏬 SPECTRE PIPELINE: {len(store_ids)} stores, {parallel} at a time, {workers} workers each...")
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=parallel) as pool:
+        futures = {pool.submit(run_store, store_id, only, force, workers): store_id for store_id in store_ids}
+        for future in as_completed(futures):
+            store_id = futures[future]
+            ok, seconds, output = future.result()
+            results[store_id] = (ok, seconds)
+            print(f"\n🏬 Store {store_id}")
+            print(output, end='')
+
+    print(f"\n{'STORE':<24}{'STATUS':<10}{'TIME':>9}")
+    for store_id in store_ids:
+        ok, seconds = results[store_id]
+        print(f"{store_id:<24}{'ok' if ok else 'failed':<10}{seconds:>8.1f}s")
+    return all(ok for ok, _ in results.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Mosaic batch pipeline, skipping stages whose inputs are unchanged.")
+    parser.add_argument('stages', nargs='*', help="Stages to bring up to date (default: all)")
+    parser.add_argument('--force', action='store_true', help="Re-run stages even if their inputs are unchanged")
+    parser.add_argument('--stores', default=None,
+                        help=f"Comma-separated store ids under {STORES_DIR}/, or 'all' (default: the working directory only)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.stages if name not in {s.name for s in STAGES}]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    if args.stores:
+        available = list_stores()
+        store_ids = available if args.stores == 'all' else [s for s in args.stores.split(',') if s]
+        missing = [s for s in store_ids if s not in available]
+        if missing:
+            parser.error(f"unknown store(s): {', '.join(missing)} (looked in {STORES_DIR}/)")
+        if not store_ids:
+            parser.error(f"no stores found in {STORES_DIR}/")
+        ok = run_stores(store_ids, only=args.stages or None, force=args.force)
+    else:
+        ok = run_pipeline(only=args.stages or None, force=args.force)
+    sys.exit(0 if ok else 1)
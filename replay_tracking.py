@@ -0,0 +1,122 @@
+import sys
+import glob
+import time
+import socket
+import argparse
+
+from live_ingestion import PERSON_TIMEOUT, UDP_HOST, UDP_PORT, LiveZoneState, parse_fixes
+from schemas import read_tracking
+
+# --- CONFIGURATION ---
+MAX_DATAGRAM_BYTES = 8192   # Comfortably below the loopback limit, several hundred fixes per packet
+
+
+def build_datagrams(df):
+    """Packs consecutive fixes into newline-delimited 'person_id,x,y,time' datagrams."""
+    lines = (df['person_id'].astype(str) + ',' + df['x'].astype(str) + ',' +
+             df['y'].astype(str) + ',' + df['time'].astype(str)).tolist()
+    times = df['time'].tolist()
+
+    batch, batch_bytes, batch_time = [], 0, None
+    for line, t in zip(lines, times):
+        if batch and (batch_bytes + len(line) + 1 > MAX_DATAGRAM_BYTES or t != batch_time):
+            yield batch_time, ('\n'.join(batch)).encode(), len(batch)
+            batch, batch_bytes = [], 0
+        batch.append(line)
+        batch_bytes += len(line) + 1
+        batch_time = t
+    if batch:
+        yield batch_time, ('\n'.join(batch)).encode(), len(batch)
+
+
+def replay(files, host=UDP_HOST, port=UDP_PORT, speed=1.0, rate=None):
+    """
+    Streams tracking files to the live service as a stand-in for the UWB anchors.
+    speed: tracking seconds replayed per wall second (0 = as fast as possible).
+    rate: optional cap in fixes per second, applied on top of speed.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    for file in files:
+        df = read_tracking(file, usecols=['person_id', 'x', 'y', 'time'])
+        df = df.sort_values('time', kind='stable')
+        print(f"▶️  Replaying {len(df)} fixes from {file} to {host}:{port}")
+
+        start_wall = time.perf_counter()
+        start_track = None
+        sent = 0
+        for track_time, payload, count in build_datagrams(df):
+            if start_track is None:
+                start_track = track_time
+            # Hold each packet until its tracking time (or the rate cap) says it is due
+            due = 0.0
+            if speed > 0:
+                due = (track_time - start_track) / speed
+            if rate:
+                due = max(due, sent / rate)
+            delay = start_wall + due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            sock.sendto(payload, (host, port))
+            sent += count
+
+        elapsed = time.perf_counter() - start_wall
+        print(f"   ✅ Sent {sent} fixes in {elapsed:.2f}s ({sent / max(elapsed, 1e-9):,.0f} fixes/s)")
+
+
+# --- SESSION CHECK ---
+def _check_state(state, seen, label):
+    """Active shoppers must be exactly those with a fix in the last PERSON_TIMEOUT seconds."""
+    clock = seen['time'].max()
+    last_fix = seen.groupby('person_id')['time'].max()
+    expected = int((last_fix >= clock - PERSON_TIMEOUT).sum())
+    snap = state.snapshot(history=1)
+    history = snap['occupancy_history']['time']
+    ok = snap['active_shoppers'] == expected and history and history[-1] == int(clock)
+    print(f"   {'✅' if ok else '❌'} {label}: {snap['active_shoppers']} active (expected {expected}), "
+          f"last occupancy sample at t={history[-1] if history else None} (clock {int(clock)})")
+    return ok
+
+
+def check_sessions(files):
+    """
+    Replays the files back to back straight into a LiveZoneState (no sockets, no waiting)
+    and checks halfway through and at the end of each day that the new day started a fresh
+    session: shoppers from earlier days are gone and the occupancy ring buffer keeps advancing.
+    """
+    state = LiveZoneState.from_model()
+    ok = True
+    for file in files:
+        df = read_tracking(file, usecols=['person_id', 'x', 'y', 'time']).sort_values('time', kind='stable')
+        halfway = df['time'].min() + (df['time'].max() - df['time'].min()) // 2
+        print(f"🔁 Checking {file} ({len(df)} fixes)")
+        checked_halfway = False
+        for track_time, payload, count in build_datagrams(df):
+            if not checked_halfway and track_time > halfway:
+                ok &= _check_state(state, df[df['time'] < track_time], 'halfway')
+                checked_halfway = True
+            state.ingest(*parse_fixes(payload))
+        ok &= _check_state(state, df, 'end of day')
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay mosaic_history_*.csv files into the live ingestion service.")
+    parser.add_argument('files', nargs='*', help="Tracking files (default: all mosaic_history_*.csv)")
+    parser.add_argument('--host', default=UDP_HOST)
+    parser.add_argument('--port', type=int, default=UDP_PORT)
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay speed multiplier, 0 for as fast as possible")
+    parser.add_argument('--rate', type=float, default=None, help="Cap in fixes per second")
+    parser.add_argument('--check', action='store_true',
+                        help="Replay in-process into a fresh live state and verify it across day boundaries")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob('mosaic_history_*.csv'))
+    if not files:
+        print("❌ Error: No 'mosaic_history_*.csv' files found in the directory.")
+        sys.exit(1)
+
+    if args.check:
+        sys.exit(0 if check_sessions(files) else 1)
+    replay(files, host=args.host, port=args.port, speed=args.speed, rate=args.rate)
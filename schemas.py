@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+
+# --- TABLE SCHEMAS ---
+# Every CSV reader goes through read_table() so frames come back with compact dtypes
+# instead of pandas' int64/float64/object defaults, and malformed rows are dropped.
+
+
+class TableSchema:
+    def __init__(self, name, dtypes, required=(), checks=None):
+        self.name = name
+        self.dtypes = dtypes          # Column -> compact dtype
+        self.required = required      # Rows missing any of these are dropped
+        self.checks = checks or {}    # Description -> function(df) returning a mask of VALID rows
+
+
+TRACKING = TableSchema(
+    'tracking',
+    dtypes={
+        'time': 'uint32',             # Seconds since the store opened
+        'person_id': 'int32',
+        'x': 'float32',               # Millimetres; float32 keeps ~1mm precision across a 15m store
+        'y': 'float32',
+        'velocity': 'float32',
+    },
+    required=('time', 'person_id', 'x', 'y'),
+    checks={
+        'negative person_id': lambda df: df['person_id'] >= 0,
+    }
+)
+
+SALES = TableSchema(
+    'sales',
+    dtypes={
+        'Transaction_ID': 'str',
+        'Customer_ID': 'int32',
+        'Date': 'category',
+        'Time': 'str',
+        'Zone': 'category',
+        'Product': 'category',
+        'Amount': 'float64',          # Summed into revenue; sales tables are small
+        'X_Loc': 'float32',
+        'Y_Loc': 'float32',
+    },
+    required=('Transaction_ID', 'Zone', 'Amount'),
+    checks={
+        'negative Amount': lambda df: df['Amount'] >= 0,
+    }
+)
+
+# KPI tables are tiny; rates and dwell stay float64 so templates never show float32 noise
+KPI = TableSchema(
+    'kpi',
+    dtypes={
+        'Date': 'category',
+        'Zone_Name': 'category',
+        'Visitors': 'int32',
+        'Avg_Dwell_Time': 'float64',
+        'Transactions': 'int32',
+        'Conversion_Rate': 'float64',
+        'Revenue': 'int64',
+    },
+    required=('Zone_Name',),
+)
+
+# Precomputed comparisons written next to the KPI tables (see comparisons.py)
+_KPI_METRICS = {'Visitors': 'int32', 'Transactions': 'int32', 'Revenue': 'int64',
+                'Conversion_Rate': 'float64', 'Avg_Dwell_Time': 'float64'}
+
+KPI_DELTAS = TableSchema(
+    'kpi_deltas',
+    dtypes={
+        'Date': 'category',
+        'Basis': 'category',          # dod / wow
+        'Base_Date': 'category',
+        'Zone_Name': 'category',
+        **{f'{m}{suffix}': t for m, t in _KPI_METRICS.items() for suffix in ('', '_Base', '_Delta')},
+        **{f'{m}_Pct': 'float64' for m in _KPI_METRICS},   # Blank when the baseline is zero
+    },
+    required=('Date', 'Basis', 'Zone_Name'),
+)
+
+KPI_PREFIX = TableSchema(
+    'kpi_prefix',
+    dtypes={
+        'Date': 'str',
+        'Zone_Name': 'str',
+        'Cum_Visitors': 'int64',
+        'Cum_Transactions': 'int64',
+        'Cum_Revenue': 'int64',
+        'Cum_Dwell_Visitors': 'float64',
+        'Cum_Days': 'int32',
+    },
+    required=('Date', 'Zone_Name'),
+)
+
+NUMERIC_KINDS = ('int', 'uint', 'float')
+
+
+def _is_numeric(dtype):
+    return dtype.startswith(NUMERIC_KINDS)
+
+
+def _wide(dtype):
+    """Parse dtype for a compact column. read_csv wraps out-of-range values when it parses
+    straight into int32/uint32 (-5 becomes 4294967291), so numbers are parsed at 64 bits and
+    range-checked by conform() before the downcast."""
+    if dtype.startswith(('int', 'uint')):
+        return 'int64'
+    if dtype.startswith('float'):
+        return 'float64'
+    return dtype
+
+
+def _read_tolerant(path, schema, usecols, **kwargs):
+    """Slow path: parse numeric columns leniently so bad rows can be dropped instead of failing the read."""
+    df = pd.read_csv(path, usecols=usecols, dtype=str, **kwargs)
+    for col, dtype in schema.dtypes.items():
+        if col in df.columns and _is_numeric(dtype):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def conform(df, schema, source='frame'):
+    """Drops rows that violate the schema and casts the survivors to the compact dtypes."""
+    before = len(df)
+
+    # Integer columns cannot hold NaN, so a blank there invalidates the row like a missing required value
+    int_cols = [c for c, t in schema.dtypes.items() if t.startswith(('int', 'uint'))]
+    must_have = [c for c in dict.fromkeys(list(schema.required) + int_cols) if c in df.columns]
+    if must_have:
+        df = df.dropna(subset=must_have)
+    # Values the compact dtype cannot hold would wrap (ints) or turn into inf (floats)
+    for col, dtype in schema.dtypes.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if col in int_cols:
+            info = np.iinfo(dtype)
+            df = df[df[col].between(info.min, info.max)]
+        elif dtype.startswith('float') and dtype != 'float64':
+            df = df[~(df[col].abs() > np.finfo(dtype).max)]   # NaN stays; it is a valid float
+    for desc, check in schema.checks.items():
+        try:
+            df = df[check(df)]
+        except KeyError:
+            continue   # Column not loaded (usecols)
+
+    dropped = before - len(df)
+    if dropped:
+        print(f"   ⚠️ {source}: dropped {dropped} invalid {schema.name} rows")
+
+    # String columns are left as parsed; everything else is cast to its compact dtype
+    casts = {c: t for c, t in schema.dtypes.items()
+             if c in df.columns and t != 'str' and str(df[c].dtype) != t}
+    if casts:
+        df = df.astype(casts)
+    return df
+
+
+def read_table(path, schema, usecols=None, **kwargs):
+    """
+    Reads a CSV into the schema's dtypes (via 64-bit numbers, see _wide). If the fast typed parse fails
+    (blank, non-numeric or out-of-range values) the file is re-read leniently and
+    the offending rows are dropped.
+    """
+    dtypes = {c: _wide(t) for c, t in schema.dtypes.items() if usecols is None or c in usecols}
+    try:
+        df = pd.read_csv(path, usecols=usecols, dtype=dtypes, **kwargs)
+    except (ValueError, TypeError, OverflowError):
+        df = _read_tolerant(path, schema, usecols, **kwargs)
+    return conform(df, schema, source=path)
+
+
+def read_tracking(path, usecols=None):
+    return read_table(path, TRACKING, usecols=usecols)
+
+
+def read_sales(path):
+    return read_table(path, SALES)
+
+
+def read_kpi(path):
+    return read_table(path, KPI)
+
+
+def read_kpi_deltas(path):
+    return read_table(path, KPI_DELTAS)
+
+
+def read_kpi_prefix(path):
+    return read_table(path, KPI_PREFIX)
@@ -0,0 +1,32 @@
+import os
+import re
+
+# --- CONFIGURATION ---
+# Each store is a sub-directory with the same flat layout a single-store deployment has
+# in its working directory: mosaic_history_*.csv, zone_model.json, sales_*.csv,
+# zone_analytics.csv, historical_analytics.csv, static/heatmap_*.png, ...
+STORES_DIR = os.getenv('MOSAIC_STORES_DIR', 'stores')
+STORE_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')   # Also keeps ids safe to use as path components
+
+
+def list_stores(stores_dir=STORES_DIR):
+    if not os.path.isdir(stores_dir):
+        return []
+    return sorted(name for name in os.listdir(stores_dir)
+                  if STORE_ID.match(name) and os.path.isdir(os.path.join(stores_dir, name)))
+
+
+def store_dir(store_id, stores_dir=STORES_DIR):
+    """
+    Data directory of a store. None is the working directory itself, so a single-store
+    deployment keeps working unchanged. Unknown or malformed ids raise KeyError.
+    """
+    if store_id is None:
+        return ''
+    if not STORE_ID.match(store_id) or not os.path.isdir(os.path.join(stores_dir, store_id)):
+        raise KeyError(store_id)
+    return os.path.join(stores_dir, store_id)
+
+
+def store_path(store_id, filename):
+    return os.path.join(store_dir(store_id), filename)
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import hashlib
+import functools
+
+import numpy as np
+
+# --- CONFIGURATION ---
+MODEL_FILE = 'zone_model.json'      # Centers + names + metadata; loads without sklearn
+LEGACY_MODEL_FILE = 'zone_model.pkl'
+ARTIFACT_FORMAT = 1
+PREDICT_CHUNK = 1_000_000           # Fixes per distance block, bounds the temporary (chunk x zones) matrix
+
+# Store layouts by zone count: rows from the back of the store (highest Y) to the front,
+# names left to right. Override per store with a JSON file of the same shape.
+LAYOUT_FILE = os.getenv('MOSAIC_ZONE_LAYOUT', 'zone_layout.json')
+DEFAULT_LAYOUTS = {
+    4: [['Electronics', 'Groceries'],
+        ['Home', 'Beauty']],
+}
+
+
+def load_layouts(path=LAYOUT_FILE):
+    """Zone count -> layout rows. A store's layout file replaces the defaults entirely."""
+    if not os.path.exists(path):
+        return dict(DEFAULT_LAYOUTS)
+    with open(path) as f:
+        raw = json.load(f)
+    layouts = {}
+    for k, rows in raw.items():
+        if sum(len(row) for row in rows) != int(k):
+            raise ValueError(f"{path}: layout for {k} zones names {sum(len(row) for row in rows)} zones")
+        names = [name for row in rows for name in row]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"{path}: layout for {k} zones repeats {', '.join(duplicates)}")
+        layouts[int(k)] = rows
+    return layouts
+
+
+# --- SMART ZONING LOGIC (BULLETPROOF FIX) ---
+def assign_zone_names_dynamically(centers, layouts=None):
+    """
+    The one naming rule shared by every consumer. Centers are sorted by Y into the
+    layout's rows (back to front), then by X within each row (left to right).
+    Zone counts without a layout get 'Zone 1'..'Zone k', numbered from the back.
+    """
+    layouts = load_layouts() if layouts is None else layouts
+    rows = layouts.get(len(centers))
+    if rows is None:
+        rows = [[f'Zone {i + 1}'] for i in range(len(centers))]
+
+    # Create a list of (cluster_id, x, y), sorted by Y-coordinate (Highest to Lowest)
+    points = [(i, float(c[0]), float(c[1])) for i, c in enumerate(centers)]
+    points.sort(key=lambda p: p[2], reverse=True)
+
+    # Strictly split by row size (No more relying on the mean!), then Left to Right within a row
+    mapping = {}
+    start = 0
+    for row in rows:
+        row_points = sorted(points[start:start + len(row)], key=lambda p: p[1])
+        for (cluster_id, _, _), name in zip(row_points, row):
+            mapping[cluster_id] = name
+        start += len(row)
+
+    return mapping
+
+
+def model_version(centers, names):
+    """Content hash of what actually drives zone assignment; stable across retrains that land on the same centers."""
+    payload = json.dumps({
+        'centers': [[round(float(v), 3) for v in c] for c in centers],
+        'names': {str(k): v for k, v in sorted(names.items())}
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class ZoneModel:
+    """Nearest-center zone assignment from a saved artifact (same result as KMeans.predict)."""
+
+    def __init__(self, centers, names, version, metadata=None):
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.names = {int(k): v for k, v in names.items()}     # cluster_id -> zone name
+        self.labels = [self.names.get(i, f'Zone {i}') for i in range(len(self.centers))]
+        self.version = version
+        self.metadata = metadata or {}
+
+    def predict(self, xs, ys):
+        """Cluster id per fix, computed in blocks so huge days never allocate an (n x zones) float64 matrix at once."""
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        labels = np.empty(len(xs), dtype=np.int16)
+        cx = self.centers[:, 0]
+        cy = self.centers[:, 1]
+        for start in range(0, len(xs), PREDICT_CHUNK):
+            bx = xs[start:start + PREDICT_CHUNK, None]
+            by = ys[start:start + PREDICT_CHUNK, None]
+            labels[start:start + PREDICT_CHUNK] = ((bx - cx) ** 2 + (by - cy) ** 2).argmin(axis=1)
+        return labels
+
+    def zone_of(self, x, y):
+        return self.labels[int(self.predict([x], [y])[0])]
+
+
+# --- SAVE / LOAD ---
+def save_zone_model(centers, metadata=None, path=MODEL_FILE, layouts=None):
+    centers = [[float(v) for v in c] for c in centers]
+    names = assign_zone_names_dynamically(centers, layouts)
+    artifact = {
+        'format': ARTIFACT_FORMAT,
+        'version': model_version(centers, names),
+        'centers': centers,
+        'names': {str(k): v for k, v in sorted(names.items())},
+        'metadata': dict(metadata or {}, trained_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(artifact, f, indent=2)
+    os.replace(tmp_path, path)   # Readers never see a half-written model
+    return artifact
+
+
+@functools.lru_cache(maxsize=8)
+def _load_cached(path, mtime_ns, size):
+    with open(path) as f:
+        artifact = json.load(f)
+    return ZoneModel(artifact['centers'], artifact['names'], artifact['version'], artifact.get('metadata'))
+
+
+def _convert_legacy_pickle(path):
+    """One-off migration for stores that still only have the pickled sklearn KMeans."""
+    import pickle
+    print(f"   ℹ️ Converting legacy {LEGACY_MODEL_FILE} to {path} (re-run zoning_engine.py to refresh).")
+    with open(LEGACY_MODEL_FILE, 'rb') as f:
+        kmeans = pickle.load(f)
+    save_zone_model(kmeans.cluster_centers_, {'converted_from': LEGACY_MODEL_FILE}, path=path)
+
+
+def load_zone_model(path=MODEL_FILE):
+    """Memoised per process; a retrained artifact (new mtime/size) is picked up on the next call."""
+    if not os.path.exists(path) and path == MODEL_FILE and os.path.exists(LEGACY_MODEL_FILE):
+        _convert_legacy_pickle(path)
+    st = os.stat(path)
+    return _load_cached(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def read_model_version(path=MODEL_FILE):
+    """The artifact's version hash, usable as a cache key by anything derived from zone assignments."""
+    return load_zone_model(path).version
@@ -1,59 +1,186 @@
 import pandas as pd
+import numpy as np
 from sklearn.cluster import KMeans
-import pickle
+from sklearn.metrics import silhouette_score, davies_bouldin_score
+from threadpoolctl import threadpool_limits
 import os
 import glob
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentation import instrument_stage, record_rows
+from schemas import read_tracking
+from zone_model import MODEL_FILE, LAYOUT_FILE, load_layouts, save_zone_model
 
 # --- CONFIGURATION ---
-MODEL_OUTPUT = 'zone_model.pkl'
-N_ZONES = 4 
+MODEL_OUTPUT = MODEL_FILE
+MAX_WORKERS = int(os.getenv('MOSAIC_WORKERS', os.cpu_count() or 1))
+
+# Candidate zone counts, e.g. "4", "3-8" or "4,6,9". Default: every count the store layout names.
+ZONE_K = os.getenv('MOSAIC_ZONE_K', '')
+SCORE_METRIC = os.getenv('MOSAIC_ZONE_METRIC', 'silhouette')   # 'silhouette' (higher wins) or 'davies_bouldin' (lower wins)
+SCORE_SAMPLE = 10000    # Points scored per k; silhouette is O(n^2), so never score the full week
+RANDOM_STATE = 42
+
+
+def parse_k_range(spec, layouts):
+    if not spec:
+        return sorted(layouts)
+    ks = set()
+    for part in spec.split(','):
+        if '-' in part:
+            lo, hi = part.split('-')
+            ks.update(range(int(lo), int(hi) + 1))
+        elif part.strip():
+            ks.add(int(part))
+    return sorted(k for k in ks if k >= 2)
+
+
+# --- 1. CANDIDATE FIT + SCORE ---
+# Points, sample and settings every candidate shares; set once per process so each task only ships its k
+_SHARED = {}
+
+
+def share_inputs(coords, sample, metric, threads):
+    """Pool initializer (and in-process setup): runs once per worker, not once per k."""
+    _SHARED.update(coords=coords, sample=sample, metric=metric, threads=threads)
+
+
+def fit_candidate(k):
+    """Fits one k on every point, then scores it on the shared bounded sample."""
+    coords, sample, metric, threads = (_SHARED[key] for key in ('coords', 'sample', 'metric', 'threads'))
+    # Each worker gets its slice of the cores so parallel fits do not oversubscribe OpenMP
+    with threadpool_limits(limits=threads):
+        start = time.perf_counter()
+        kmeans = KMeans(n_clusters=k, init='k-means++', random_state=RANDOM_STATE, n_init=10)
+        kmeans.fit(coords)
+        fit_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        labels = kmeans.predict(sample)
+        if len(np.unique(labels)) < 2:
+            score = None   # Degenerate: the sample landed in a single cluster
+        elif metric == 'davies_bouldin':
+            score = float(davies_bouldin_score(sample, labels))
+        else:
+            score = float(silhouette_score(sample, labels))
+        score_seconds = time.perf_counter() - start
+
+    return {
+        'k': k,
+        'centers': kmeans.cluster_centers_.tolist(),
+        'inertia': float(kmeans.inertia_),
+        'score': score,
+        'fit_seconds': round(fit_seconds, 3),
+        'score_seconds': round(score_seconds, 3)
+    }
+
+
+def pick_best(results, metric):
+    scored = [r for r in results if r['score'] is not None]
+    if not scored:
+        return min(results, key=lambda r: r['k'])
+    if metric == 'davies_bouldin':
+        return min(scored, key=lambda r: r['score'])
+    return max(scored, key=lambda r: r['score'])
+
+
+def print_k_report(results, best, metric):
+    print(f"\n{'K':>4}{'FIT':>10}{'SCORE TIME':>12}{'INERTIA':>18}{metric.upper():>16}")
+    for r in results:
+        score = f"{r['score']:.4f}" if r['score'] is not None else '-'
+        marker = '  ◀ selected' if r is best else ''
+        print(f"{r['k']:>4}{r['fit_seconds']:>9.2f}s{r['score_seconds']:>11.2f}s{r['inertia']:>18,.0f}{score:>16}{marker}")
 
+
+@instrument_stage('zoning')
 def train_zoning_model():
     print("🛰️  SPECTRE SYSTEM: Initializing Global Dynamic Zoning...")
-    
+
     tracking_files = sorted(glob.glob('mosaic_history_*.csv'))
-    
+
     if not tracking_files:
         print("❌ Error: No 'mosaic_history_*.csv' files found in the directory.")
         return
 
+    layouts = load_layouts()
+    k_values = parse_k_range(ZONE_K, layouts)
+    if not k_values:
+        print(f"❌ Error: No candidate zone counts (MOSAIC_ZONE_K='{ZONE_K}').")
+        return
+    if SCORE_METRIC not in ('silhouette', 'davies_bouldin'):
+        print(f"❌ Error: Unknown MOSAIC_ZONE_METRIC '{SCORE_METRIC}' (use silhouette or davies_bouldin).")
+        return
+
     print(f"📁 Found {len(tracking_files)} tracking files. Combining data for Global AI Training...")
-    
+
     all_coords = []
     for file in tracking_files:
         try:
-            df_part = pd.read_csv(file, usecols=['x', 'y'])
+            df_part = read_tracking(file, usecols=['x', 'y'])
             all_coords.append(df_part)
             print(f"   -> Loaded {len(df_part)} points from {file}")
         except Exception as e:
             print(f"   ❌ Error reading {file}: {e}")
-            
+
     # SAFETY CHECK: Ensure we actually loaded data before concatenating
     if not all_coords:
         print("❌ Error: No valid data could be extracted from the tracking files.")
         return
 
     df_combined = pd.concat(all_coords, ignore_index=True)
-    
+    record_rows(len(df_combined))
+
     # Clean the data for spatial mapping
-    unique_coords = df_combined.drop_duplicates()
-    
+    unique_coords = df_combined.drop_duplicates().to_numpy()
+    k_values = [k for k in k_values if k < len(unique_coords)]
+    if not k_values:
+        print(f"❌ Error: Only {len(unique_coords)} unique points, too few for any candidate zone count.")
+        return
+
     print(f"\n🧬 Analyzing {len(unique_coords)} unique density points across the entire week...")
 
-    # Train K-Means
-    kmeans = KMeans(n_clusters=N_ZONES, init='k-means++', random_state=42, n_init=10)
-    kmeans.fit(unique_coords)
-
-    # Save the model
-    kmeans.feature_names_in_ = ['x', 'y'] 
-    with open(MODEL_OUTPUT, 'wb') as f:
-        pickle.dump(kmeans, f)
-    
-    print(f"\n✅ Step 1 Complete: Global AI Model saved to {MODEL_OUTPUT}")
-    
-    centers = kmeans.cluster_centers_
+    # One bounded random sample shared by every candidate, so scores are comparable and cheap
+    rng = np.random.default_rng(RANDOM_STATE)
+    sample_size = min(SCORE_SAMPLE, len(unique_coords))
+    sample = unique_coords[rng.choice(len(unique_coords), size=sample_size, replace=False)]
+
+    # Train one K-Means per candidate k, in parallel across cores
+    workers = max(1, min(MAX_WORKERS, len(k_values)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"🔎 Trying k = {', '.join(map(str, k_values))} ({SCORE_METRIC} on {sample_size} sampled points, {workers} workers)")
+    shared = (unique_coords, sample, SCORE_METRIC, threads)
+    if workers == 1:
+        share_inputs(*shared)
+        results = list(map(fit_candidate, k_values))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=share_inputs, initargs=shared) as pool:
+            results = list(pool.map(fit_candidate, k_values))
+
+    best = pick_best(results, SCORE_METRIC)
+    print_k_report(results, best, SCORE_METRIC)
+    if best['k'] not in layouts:
+        print(f"   ⚠️ No layout for {best['k']} zones; using generic names (add one to {LAYOUT_FILE}).")
+
+    # Save the compact artifact (centers + names), no pickled sklearn object
+    artifact = save_zone_model(best['centers'], {
+        'n_zones': best['k'],
+        'n_points': int(len(unique_coords)),
+        'inertia': best['inertia'],
+        'source_files': tracking_files,
+        'k_search': {
+            'metric': SCORE_METRIC,
+            'sample_size': sample_size,
+            'candidates': [{key: r[key] for key in ('k', 'score', 'inertia', 'fit_seconds', 'score_seconds')}
+                           for r in results]
+        }
+    }, path=MODEL_OUTPUT, layouts=layouts)
+
+    print(f"\n✅ Step 1 Complete: Global AI Model saved to {MODEL_OUTPUT} (version {artifact['version']})")
+
+    centers = artifact['centers']
     for i, center in enumerate(centers):
-        print(f"📍 Zone {i} Center: X={center[0]:.0f}, Y={center[1]:.0f}")
+        print(f"📍 Zone {i} Center: X={center[0]:.0f}, Y={center[1]:.0f} -> {artifact['names'][str(i)]}")
 
 if __name__ == "__main__":
-    train_zoning_model()
\ No newline at end of file
+    train_zoning_model()